@@ -1,26 +1,96 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import random
+import argparse
 import sys
+import threading
+import time
+
+import engine
+import gamestate
+import terminal
+
+AI_MIN_DISPLAY_MS = 600
+AI_POLL_MS = 15
+RESIZE_FRAME_MS = 16
+REPLAY_MOVE_MS = 500
+REPLAY_PAUSE_MS = 1500
+ULTIMATE_VARIANT = "Ultimate (9×9)"
+
+# Bound by load_tk() when the window's options are parsed, so --terminal and --headless never import
+# tkinter or anything else only the window uses.
+tk = ttk = messagebox = tkfont = BoardCanvas = None
+analysis = history = records = spectator = ultimate = sqlite3 = Telemetry = ThreadPoolExecutor = None
+
+
+def load_tk():
+    global tk, ttk, messagebox, tkfont, BoardCanvas
+    global analysis, history, records, spectator, ultimate, sqlite3, Telemetry, ThreadPoolExecutor
+    if tk is None:
+        import tkinter
+        import tkinter.font
+        from tkinter import ttk as tk_ttk, messagebox as tk_messagebox
+        from board_canvas import BoardCanvas as board_canvas
+        from concurrent.futures import ThreadPoolExecutor as thread_pool
+        import analysis as analysis_module
+        import history as history_module
+        import records as records_module
+        import spectator as spectator_module
+        import sqlite3 as sqlite3_module
+        from telemetry import Telemetry as telemetry_class
+        import ultimate as ultimate_module
+
+        ttk, messagebox, tkfont, BoardCanvas = tk_ttk, tk_messagebox, tkinter.font, board_canvas
+        analysis, history, records, spectator = analysis_module, history_module, records_module, spectator_module
+        ultimate, sqlite3, Telemetry, ThreadPoolExecutor = ultimate_module, sqlite3_module, telemetry_class, thread_pool
+        tk = tkinter
+    return tk
+
 
 class TicTacToeApp:
-    def __init__(self, root):
+    def __init__(self, root, telemetry=None, history_store=None, recorder=None, show_analysis=False):
+        load_tk()
         self.root = root
         self.root.title("Tic-Tac-Toe")
         
         self.root.minsize(500, 700)
         
-        self.board = [""] * 9
+        self.board = engine.Board()
+        self.timeline = gamestate.Timeline(gamestate.GameState(self.board.geometry))
         self.player = "X"
         self.ai = "O"
         self.current_turn = "X"
         self.game_active = True
 
+        self.ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+        self.ai_future = None
+        self.ai_token = 0
+        self.ai_stop = None
+        # Searcher instances for the AI worker only, so no other search can touch their trees.
+        self.ai_searchers = {}
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.history = history_store
+        self.recorder = recorder
+        self.replay_job = None
+        self.spectator = None
+        self.spectate_job = None
+        self.spectate_stop = None
+        self.spectate_future = None
+        self.spectate_scored = 0.0
+        # AI think times keyed by the state each move led to, so undo, redo and branches keep them
+        # lined up with the moves that are recorded.
+        self.ai_latencies = {}
+
         self.player_score = 0
         self.ai_score = 0
         self.draws = 0
 
         self.difficulty = tk.StringVar(value="Expert")
+        self.board_variant = tk.StringVar(value="3×3")
+        self.show_analysis = tk.BooleanVar(value=show_analysis)
+        self.spectating = tk.BooleanVar(value=False)
+        self.spectate_x = tk.StringVar(value="Hard")
+        self.spectate_o = tk.StringVar(value="Expert")
+        self.spectate_speed = tk.StringVar(value="Normal")
+        self.ply_choice = tk.StringVar(value="Start")
+        self.branch_choice = tk.StringVar(value="")
 
         self.colors = {
             "bg": "#0f0c29",
@@ -42,25 +112,27 @@ class TicTacToeApp:
         self.button_font_size = 11
         self.stats_font_size = 14
         self.status_font_size = 14
+        self.resize_job = None
+        self.board_pixels = None
         
+        self.create_fonts()
         self.setup_style()
         self.create_ui()
         
         self.center_window()
         
         self.root.bind("<Configure>", self.on_window_resize)
+        self.root.bind("<Control-z>", lambda e: self.undo_move())
+        self.root.bind("<Control-y>", lambda e: self.redo_move())
 
     def center_window(self):
-        self.root.update_idletasks()
-        
+        # The screen size is known without a layout pass, so the window is placed once, before it maps.
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         
         window_width = min(int(screen_width * 0.8), 900)
         window_height = min(int(screen_height * 0.85), 1100)
         
-        self.root.geometry(f"{window_width}x{window_height}")
-        
         x = (screen_width // 2) - (window_width // 2)
         y = (screen_height // 2) - (window_height // 2)
         
@@ -72,18 +144,50 @@ class TicTacToeApp:
         self.original_height = window_height
 
     def on_window_resize(self, event):
-        if event.widget == self.root:
-            self.window_width = event.width
-            self.window_height = event.height
+        if event.widget != self.root:
+            return
+        if (event.width, event.height) == (self.window_width, self.window_height):
+            return
             
-            self.update_font_sizes()
-            self.update_board_button_sizes()
-            self.update_layout()
+        self.window_width = event.width
+        self.window_height = event.height
+        if self.resize_job is None:
+            self.resize_job = self.root.after(RESIZE_FRAME_MS, self.apply_resize)
+
+    def apply_resize(self):
+        self.resize_job = None
+        self.update_font_sizes()
+        self.update_board_size()
+        self.update_layout()
+
+    def create_fonts(self):
+        self.fonts = {
+            name: tkfont.Font(root=self.root, family=family, size=size, weight=weight)
+            for name, (family, size, weight) in self.font_specs().items()
+        }
+
+    def font_specs(self):
+        return {
+            "title": ("Segoe UI Black", self.title_font_size, "normal"),
+            "title_icon": ("Segoe UI", self.title_font_size, "normal"),
+            "subtitle": ("Segoe UI", max(10, self.button_font_size - 1), "normal"),
+            "stats": ("Segoe UI Semibold", self.stats_font_size, "normal"),
+            "label": ("Segoe UI", self.button_font_size, "normal"),
+            "combo": ("Segoe UI", self.button_font_size - 1, "normal"),
+            "status": ("Segoe UI", self.status_font_size, "bold"),
+            "board": ("Segoe UI Black", self.cell_font_size(), "normal"),
+            "note": ("Segoe UI", max(8, self.cell_font_size() // 3), "bold"),
+            "button": ("Segoe UI", self.button_font_size, "bold"),
+            "footer": ("Segoe UI", max(9, self.button_font_size - 2), "normal")
+        }
+
+    def apply_font_sizes(self):
+        for name, (family, size, weight) in self.font_specs().items():
+            font = self.fonts[name]
+            if font.cget("size") != size:
+                font.configure(size=size)
 
     def update_font_sizes(self):
-        if not hasattr(self, 'title_label'):
-            return
-            
         width_scale = self.window_width / self.original_width
         height_scale = self.window_height / self.original_height
         scale_factor = min(width_scale, height_scale, 1.5)
@@ -94,39 +198,14 @@ class TicTacToeApp:
         self.stats_font_size = max(10, int(14 * scale_factor * 0.8))
         self.status_font_size = max(12, int(14 * scale_factor))
         
-        try:
-            self.title_label.config(font=("Segoe UI Black", self.title_font_size))
-            self.score_label.config(font=("Segoe UI Semibold", self.stats_font_size))
-            self.status_label.config(font=("Segoe UI", self.status_font_size, "bold"))
-            
-            for btn in self.buttons:
-                btn.config(font=("Segoe UI Black", self.board_font_size))
-            
-            for child in self.action_frame.winfo_children():
-                if isinstance(child, tk.Button):
-                    child.config(font=("Segoe UI", self.button_font_size, "bold"))
-            
-            self.subtitle.config(font=("Segoe UI", max(10, self.button_font_size - 1)))
-            self.footer.config(font=("Segoe UI", max(9, self.button_font_size - 2)))
-            
-            for child in self.diff_frame.winfo_children():
-                if isinstance(child, tk.Label):
-                    child.config(font=("Segoe UI", self.button_font_size))
-            
-            self.diff_combo.config(font=("Segoe UI", self.button_font_size - 1))
-        except:
-            pass
+        self.apply_font_sizes()
 
-    def update_board_button_sizes(self):
-        if not hasattr(self, 'buttons'):
+    def update_board_size(self):
+        board_pixels = max(240, int(min(self.window_width * 0.6, self.window_height * 0.45)))
+        if board_pixels == self.board_pixels:
             return
-            
-        board_size = min(self.window_width * 0.6, self.window_height * 0.35)
-        btn_width = max(2, int(board_size // 30))
-        btn_height = max(1, int(board_size // 60))
-        
-        for btn in self.buttons:
-            btn.config(width=btn_width, height=btn_height)
+        self.board_pixels = board_pixels
+        self.board_view.resize(board_pixels)
 
     def update_layout(self):
         try:
@@ -155,7 +234,7 @@ class TicTacToeApp:
 
         style.configure(
             "TButton",
-            font=("Segoe UI", self.button_font_size, "bold"),
+            font=self.fonts["button"],
             padding=10,
             relief="flat",
             borderwidth=0
@@ -165,7 +244,7 @@ class TicTacToeApp:
             "TLabel",
             background=self.colors["bg"],
             foreground=self.colors["text"],
-            font=("Segoe UI", self.button_font_size)
+            font=self.fonts["label"]
         )
 
     def create_ui(self):
@@ -183,7 +262,7 @@ class TicTacToeApp:
         self.title_label = tk.Label(
             title_frame,
             text="TIC-TAC-TOE",
-            font=("Segoe UI Black", self.title_font_size),
+            font=self.fonts["title"],
             fg=self.colors["x"],
             bg=self.colors["bg"]
         )
@@ -192,7 +271,7 @@ class TicTacToeApp:
         tk.Label(
             title_frame,
             text="⚡",
-            font=("Segoe UI", self.title_font_size),
+            font=self.fonts["title_icon"],
             fg=self.colors["o"],
             bg=self.colors["bg"]
         ).pack(side=tk.LEFT, padx=5)
@@ -200,7 +279,7 @@ class TicTacToeApp:
         self.subtitle = tk.Label(
             self.header_frame,
             text="AI Powered Strategy Game",
-            font=("Segoe UI", max(10, self.button_font_size - 1)),
+            font=self.fonts["subtitle"],
             fg="#94a3b8",
             bg=self.colors["bg"]
         )
@@ -219,7 +298,7 @@ class TicTacToeApp:
         self.score_label = tk.Label(
             self.stats_card,
             text=self.get_score_text(),
-            font=("Segoe UI Semibold", self.stats_font_size),
+            font=self.fonts["stats"],
             bg=self.colors["card"],
             fg=self.colors["text"],
             padx=20,
@@ -236,22 +315,54 @@ class TicTacToeApp:
         tk.Label(
             self.diff_frame,
             text="🛡️ AI Difficulty:",
-            font=("Segoe UI", self.button_font_size),
+            font=self.fonts["label"],
             fg="#cbd5e1",
             bg=self.colors["bg"]
         ).pack(side=tk.LEFT, padx=(0, 5))
 
         self.diff_combo = ttk.Combobox(
             self.diff_frame,
-            values=["Easy", "Medium", "Hard", "Expert"],
+            values=list(engine.DIFFICULTIES),
             textvariable=self.difficulty,
             state="readonly",
             width=12,
-            font=("Segoe UI", self.button_font_size - 1)
+            font=self.fonts["combo"]
         )
         self.diff_combo.pack(side=tk.LEFT)
         self.diff_combo.bind("<<ComboboxSelected>>", lambda e: self.reset_game())
 
+        tk.Label(
+            self.diff_frame,
+            text="📐 Board:",
+            font=self.fonts["label"],
+            fg="#cbd5e1",
+            bg=self.colors["bg"]
+        ).pack(side=tk.LEFT, padx=(15, 5))
+
+        self.size_combo = ttk.Combobox(
+            self.diff_frame,
+            values=list(engine.BOARD_VARIANTS) + [ULTIMATE_VARIANT],
+            textvariable=self.board_variant,
+            state="readonly",
+            width=16,
+            font=self.fonts["combo"]
+        )
+        self.size_combo.pack(side=tk.LEFT)
+        self.size_combo.bind("<<ComboboxSelected>>", lambda e: self.change_board_variant())
+
+        tk.Checkbutton(
+            self.diff_frame,
+            text="💡 Analysis",
+            variable=self.show_analysis,
+            command=self.update_analysis,
+            font=self.fonts["label"],
+            fg="#cbd5e1",
+            bg=self.colors["bg"],
+            selectcolor=self.colors["card"],
+            activebackground=self.colors["bg"],
+            activeforeground=self.colors["text"]
+        ).pack(side=tk.LEFT, padx=(15, 0))
+
         self.status_indicator = tk.Frame(
             control_panel,
             bg=self.colors["x"],
@@ -263,12 +374,56 @@ class TicTacToeApp:
         self.status_label = tk.Label(
             control_panel,
             text="🎮 Your Turn (X)",
-            font=("Segoe UI", self.status_font_size, "bold"),
+            font=self.fonts["status"],
             fg=self.colors["x"],
             bg=self.colors["bg"]
         )
         self.status_label.pack(side=tk.LEFT)
 
+        self.spectate_frame = tk.Frame(main_container, bg=self.colors["bg"])
+        self.spectate_frame.pack(fill="x", padx=20)
+
+        tk.Checkbutton(
+            self.spectate_frame,
+            text="🎬 AI vs AI",
+            variable=self.spectating,
+            command=self.toggle_spectating,
+            font=self.fonts["label"],
+            fg="#cbd5e1",
+            bg=self.colors["bg"],
+            selectcolor=self.colors["card"],
+            activebackground=self.colors["bg"],
+            activeforeground=self.colors["text"]
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        # The pairing and speed pickers are built the first time AI vs AI starts.
+        self.spectate_controls = False
+
+        self.timeline_frame = tk.Frame(main_container, bg=self.colors["bg"])
+        self.timeline_frame.pack(fill="x", padx=20, pady=(5, 0))
+
+        # Both lists are filled only when they are opened, so playing a move never rebuilds them.
+        for text, variable, values, pick in (
+            ("⏪ Go to Move:", self.ply_choice, self.ply_labels, self.show_ply),
+            ("🔀 Branch:", self.branch_choice, self.branch_labels, self.show_branch)
+        ):
+            tk.Label(
+                self.timeline_frame,
+                text=text,
+                font=self.fonts["label"],
+                fg="#cbd5e1",
+                bg=self.colors["bg"]
+            ).pack(side=tk.LEFT, padx=(0, 5))
+            combo = ttk.Combobox(
+                self.timeline_frame,
+                textvariable=variable,
+                state="readonly",
+                width=16,
+                font=self.fonts["combo"]
+            )
+            combo.config(postcommand=lambda c=combo, v=values: c.config(values=v()))
+            combo.pack(side=tk.LEFT, padx=(0, 15))
+            combo.bind("<<ComboboxSelected>>", lambda e, c=combo, p=pick: p(c.current()))
+
         self.board_container = tk.Frame(
             main_container,
             bg=self.colors["accent"],
@@ -277,39 +432,8 @@ class TicTacToeApp:
         )
         self.board_container.pack(pady=10, expand=True)
 
-        board_frame = tk.Frame(
-            self.board_container,
-            bg=self.colors["card"]
-        )
-        board_frame.pack(expand=True)
-
-        self.buttons = []
-        btn_width = 3
-        btn_height = 1
-        
-        for i in range(9):
-            btn = tk.Button(
-                board_frame,
-                text="",
-                font=("Segoe UI Black", self.board_font_size),
-                width=btn_width,
-                height=btn_height,
-                bg=self.colors["button"],
-                fg=self.colors["text"],
-                activebackground=self.colors["button_hover"],
-                relief="flat",
-                cursor="hand2",
-                command=lambda i=i: self.player_move(i)
-            )
-            btn.grid(row=i//3, column=i%3, padx=3, pady=3, sticky="nsew")
-            
-            board_frame.grid_rowconfigure(i//3, weight=1)
-            board_frame.grid_columnconfigure(i%3, weight=1)
-            
-            btn.bind("<Enter>", lambda e, b=btn: self.on_button_hover(b, True))
-            btn.bind("<Leave>", lambda e, b=btn: self.on_button_hover(b, False))
-            
-            self.buttons.append(btn)
+        self.board_view = None
+        self.build_board()
 
         self.action_frame = tk.Frame(main_container, bg=self.colors["bg"])
         self.action_frame.pack(fill="x", pady=15)
@@ -325,7 +449,7 @@ class TicTacToeApp:
             btn = tk.Button(
                 self.action_frame,
                 text=text,
-                font=("Segoe UI", self.button_font_size, "bold"),
+                font=self.fonts["button"],
                 bg=color,
                 fg="white",
                 activebackground=color,
@@ -346,17 +470,46 @@ class TicTacToeApp:
         self.footer = tk.Label(
             main_container,
             text="Made with ❤️ | AI Internship Project",
-            font=("Segoe UI", max(9, self.button_font_size - 2)),
+            font=self.fonts["footer"],
             fg="#64748b",
             bg=self.colors["bg"]
         )
         self.footer.pack(side="bottom", pady=10)
 
-    def on_button_hover(self, button, enter):
-        if enter and button["text"] == "" and self.game_active:
-            button.config(bg=self.colors["button_hover"])
-        elif button["text"] == "":
-            button.config(bg=self.colors["button"])
+    def build_board(self):
+        block = 3 if isinstance(self.board, ultimate.UltimateBoard) else None
+        if self.board_view is not None:
+            self.board_view.set_size(self.board.geometry.size, block)
+            return
+
+        self.board_view = BoardCanvas(
+            self.board_container,
+            self.colors,
+            self.fonts["board"],
+            size=self.board.geometry.size,
+            on_click=self.player_move,
+            is_active=lambda: self.game_active,
+            block=block,
+            note_font=self.fonts["note"]
+        )
+        self.board_view.resize(360)
+        self.board_view.pack(expand=True)
+
+    def cell_font_size(self):
+        return max(12, int(self.board_font_size * 3 / self.board.geometry.size))
+
+    def change_board_variant(self):
+        variant = self.board_variant.get()
+        self.cancel_ai_move()
+        if variant == ULTIMATE_VARIANT:
+            self.board = ultimate.UltimateBoard()
+        else:
+            size, win_length = engine.BOARD_VARIANTS[variant]
+            self.board = engine.Board(geometry=engine.geometry_for(size, win_length))
+        self.apply_font_sizes()
+        self.build_board()
+        self.reset_game()
+        self.status_label.config(text="🎮 Your Turn (X)", fg=self.colors["x"])
 
     def lighten_color(self, color):
         if color.startswith("#"):
@@ -366,7 +519,7 @@ class TicTacToeApp:
         return color
 
     def player_move(self, index):
-        if not self.game_active or self.board[index] != "" or self.current_turn != self.player:
+        if not self.game_active or not self.board.is_legal(index) or self.current_turn != self.player:
             return
 
         self.make_move(index, self.player)
@@ -378,11 +531,55 @@ class TicTacToeApp:
         self.current_turn = self.ai
         self.update_status_indicator(self.ai)
         self.status_label.config(text="🤖 AI Thinking...", fg=self.colors["o"])
-        self.root.after(600, self.ai_move)
+        self.request_ai_move()
+
+    def request_ai_move(self):
+        self.cancel_ai_move()
+        self.ai_stop = threading.Event()
+        self.ai_future = self.ai_executor.submit(
+            self.compute_ai_move,
+            self.timeline.current.board(),
+            self.difficulty.get(),
+            self.ai_stop
+        )
+        self.poll_ai_move(self.ai_future, self.ai_token, time.monotonic())
+
+    def compute_ai_move(self, board, difficulty, stop):
+        started = time.perf_counter()
+        move = self.telemetry.ai_move(board, difficulty, self.ai, self.player,
+                                      searchers=self.ai_searchers, stop=stop)
+        return move, (time.perf_counter() - started) * 1000
+
+    def poll_ai_move(self, future, token, started):
+        if token != self.ai_token:
+            return
+        if not future.done():
+            self.root.after(AI_POLL_MS, self.poll_ai_move, future, token, started)
+            return
 
-    def ai_move(self):
-        move = self.get_ai_move()
+        self.ai_future = None
+        move, latency_ms = future.result()
+        remaining = AI_MIN_DISPLAY_MS - int((time.monotonic() - started) * 1000)
+        if remaining > 0:
+            self.root.after(remaining, self.ai_move, move, token, latency_ms)
+        else:
+            self.ai_move(move, token, latency_ms)
+
+    def cancel_ai_move(self):
+        self.ai_token += 1
+        if self.ai_stop is not None:
+            # A search that has already started only notices this event; future.cancel() cannot stop it.
+            self.ai_stop.set()
+            self.ai_stop = None
+        if self.ai_future is not None:
+            self.ai_future.cancel()
+            self.ai_future = None
+
+    def ai_move(self, move, token, latency_ms=0.0):
+        if token != self.ai_token or not self.game_active:
+            return
         self.make_move(move, self.ai)
+        self.ai_latencies[self.timeline.current] = latency_ms
 
         if self.check_game_end():
             self.root.after(1000, self.offer_next_round)
@@ -393,13 +590,96 @@ class TicTacToeApp:
         self.status_label.config(text="🎮 Your Turn (X)", fg=self.colors["x"])
 
     def make_move(self, index, symbol):
-        self.board[index] = symbol
-        self.buttons[index].config(
-            text=symbol,
-            fg=self.colors["x"] if symbol == "X" else self.colors["o"],
-            bg=self.colors["button"]
+        self.board.place(index, symbol)
+        self.timeline.play(index)
+        self.ply_choice.set(self.describe_state(self.timeline.current))
+        self.branch_choice.set("")
+        self.board_view.set_mark(index, symbol)
+        self.update_regions()
+        self.update_analysis()
+
+    def undo_move(self):
+        # Back to the player's previous turn, taking back the AI's reply along with the player's move.
+        if self.game_active:
+            state = self.timeline.undo_to(self.player)
+            if state is not None:
+                self.show_state(state)
+
+    def redo_move(self):
+        if self.game_active:
+            state = self.timeline.redo_to(self.player)
+            if state is not None:
+                self.show_state(state)
+
+    def show_ply(self, ply):
+        if self.game_active:
+            self.show_state(self.timeline.goto(ply))
+
+    def show_branch(self, index):
+        # Puts a line abandoned by an earlier undo back on show, at its last position.
+        branches = self.timeline.branches
+        if self.game_active and 0 <= index < len(branches):
+            label = self.branch_labels()[index]
+            self.show_state(self.timeline.switch(branches[index]))
+            self.branch_choice.set(label)
+
+    def describe_state(self, state):
+        if state.move is None:
+            return "Start"
+        mover = "O" if state.turn == "X" else "X"
+        return f"{state.ply}. {mover} {terminal.describe_move(self.board, state.move)}"
+
+    def ply_labels(self):
+        return [self.describe_state(state) for state in self.timeline.line]
+
+    def branch_labels(self):
+        # First and last move of each line, which is enough to tell lines from the same game apart.
+        labels = []
+        for number, branch in enumerate(self.timeline.branches, 1):
+            first = branch.line()[1]
+            labels.append(f"#{number} {self.describe_state(first)} … {self.describe_state(branch)}")
+        return labels
+
+    def show_state(self, state):
+        # Shows a position from the timeline; the AI takes over if it is its turn there.
+        self.cancel_ai_move()
+        self.ply_choice.set(self.describe_state(state))
+        self.branch_choice.set("")
+        self.board = state.board()
+        self.current_turn = state.turn
+        self.board_view.set_position([self.board[i] for i in range(len(self.board))], ())
+        self.update_regions()
+        self.update_analysis()
+        self.update_status_indicator(state.turn)
+        if state.turn == self.ai:
+            self.status_label.config(text="🤖 AI Thinking...", fg=self.colors["o"])
+            self.request_ai_move()
+        else:
+            self.status_label.config(text="🎮 Your Turn (X)", fg=self.colors["x"])
+
+    def update_regions(self):
+        if not isinstance(self.board, ultimate.UltimateBoard):
+            return
+        legal = set() if self.board.is_over() else set(self.board.legal_moves())
+        self.board_view.set_regions(
+            {i for i in range(len(self.board)) if i not in legal},
+            self.board.owners()
         )
 
+    def update_analysis(self):
+        notes = {}
+        board = self.board
+        if self.show_analysis.get() and isinstance(board, engine.Board):
+            evaluator = analysis.evaluator_for(board.geometry)
+            if evaluator.available():
+                mover, other = ("X", "O") if bin(board.x).count("1") == bin(board.o).count("1") else ("O", "X")
+                colors = {analysis.WIN: self.colors["win"], analysis.DRAW: "#94a3b8", analysis.LOSS: self.colors["exit"]}
+                notes = {
+                    cell: (analysis.describe(entry), colors[entry & 3])
+                    for cell, entry in evaluator.analyse_board(board, mover, other).items()
+                }
+        self.board_view.set_notes(notes)
+
     def offer_next_round(self):
         if messagebox.askyesno("Play Again?", "Do you want to play another round?\n\nScores will be kept."):
             self.start_next_round()
@@ -444,133 +724,204 @@ class TicTacToeApp:
         self.status_indicator.config(bg=color)
 
     def get_ai_move(self):
-        empty = [i for i in range(9) if self.board[i] == ""]
-
-        if self.difficulty.get() == "Easy":
-            return random.choice(empty)
-
-        if self.difficulty.get() in ["Medium", "Hard"]:
-            for i in empty:
-                self.board[i] = self.ai
-                if self.check_winner() == self.ai:
-                    self.board[i] = ""
-                    return i
-                self.board[i] = ""
-            
-            for i in empty:
-                self.board[i] = self.player
-                if self.check_winner() == self.player:
-                    self.board[i] = ""
-                    return i
-                self.board[i] = ""
-            
-            if self.difficulty.get() == "Hard" and len(empty) > 0:
-                preferred = [4, 0, 2, 6, 8, 1, 3, 5, 7]
-                for pos in preferred:
-                    if pos in empty:
-                        return pos
-            
-            return random.choice(empty)
-
-        return self.minimax_best_move()
+        return engine.get_ai_move(self.board, self.difficulty.get(), self.ai, self.player)
 
     def minimax_best_move(self):
-        best_score = -float('inf')
-        best_move = None
-
-        for i in range(9):
-            if self.board[i] == "":
-                self.board[i] = self.ai
-                score = self.minimax(0, False)
-                self.board[i] = ""
-                if score > best_score:
-                    best_score = score
-                    best_move = i
-        return best_move if best_move is not None else random.choice([i for i in range(9) if self.board[i] == ""])
+        return engine.minimax_best_move(self.board, self.ai, self.player)
 
     def minimax(self, depth, is_maximizing):
-        winner = self.check_winner()
-        if winner == self.ai:
-            return 10 - depth
-        if winner == self.player:
-            return depth - 10
-        if "" not in self.board:
-            return 0
-
-        if is_maximizing:
-            best_score = -float('inf')
-            for i in range(9):
-                if self.board[i] == "":
-                    self.board[i] = self.ai
-                    score = self.minimax(depth + 1, False)
-                    self.board[i] = ""
-                    best_score = max(best_score, score)
-            return best_score
-        else:
-            best_score = float('inf')
-            for i in range(9):
-                if self.board[i] == "":
-                    self.board[i] = self.player
-                    score = self.minimax(depth + 1, True)
-                    self.board[i] = ""
-                    best_score = min(best_score, score)
-            return best_score
+        return engine.minimax(self.board.mask(self.ai), self.board.mask(self.player), depth, is_maximizing)
 
     def check_winner(self):
-        combos = [
-            (0,1,2),(3,4,5),(6,7,8),
-            (0,3,6),(1,4,7),(2,5,8),
-            (0,4,8),(2,4,6)
-        ]
-        for a,b,c in combos:
-            if self.board[a] == self.board[b] == self.board[c] != "":
-                return self.board[a]
-        return None
+        return self.board.winner()
 
     def check_game_end(self):
         winner = self.check_winner()
         if winner:
             self.game_active = False
-            combos = [
-                (0,1,2),(3,4,5),(6,7,8),
-                (0,3,6),(1,4,7),(2,5,8),
-                (0,4,8),(2,4,6)
-            ]
-            for a,b,c in combos:
-                if self.board[a] == self.board[b] == self.board[c] != "":
-                    for i in (a,b,c):
-                        self.buttons[i].config(
-                            bg=self.colors["win"],
-                            relief="ridge",
-                            bd=3
-                        )
+            self.board_view.highlight(self.board.winning_cells())
             
             if winner == self.player:
                 self.player_score += 1
+                self.record_game("player")
             else:
                 self.ai_score += 1
+                self.record_game("ai")
             self.update_score()
             return True
 
-        if "" not in self.board:
+        if self.board.is_full():
             self.game_active = False
             self.draws += 1
+            self.record_game("draw")
             self.update_score()
             return True
         return False
 
+    def record_game(self, outcome):
+        if self.recorder is not None and isinstance(self.board, engine.Board):
+            self.recorder.write_moves(self.board.geometry, self.difficulty.get(), self.timeline.moves())
+        if self.history is None:
+            return
+        try:
+            self.history.record_game(history.GameRecord(
+                self.difficulty.get(),
+                self.board.geometry.name,
+                outcome,
+                self.timeline.moves(),
+                [self.ai_latencies[state] for state in self.timeline.states() if state in self.ai_latencies]
+            ))
+        except sqlite3.Error as exc:
+            messagebox.showwarning("Match History", f"An earlier game could not be saved:\n{exc}")
+
+    def replay_game(self, game, delay_ms=REPLAY_MOVE_MS, on_done=None):
+        for label, variant in engine.BOARD_VARIANTS.items():
+            if variant == (game.size, game.win_length):
+                self.board_variant.set(label)
+        if game.geometry != self.board.geometry:
+            self.board = engine.Board(geometry=game.geometry)
+            self.apply_font_sizes()
+            self.build_board()
+        if game.difficulty is not None:
+            self.difficulty.set(game.difficulty)
+
+        self.reset_game()
+        self.game_active = False
+        self.status_label.config(text="▶️ Replaying Game...", fg=self.colors["accent"])
+        self.replay_step(game.replay(), delay_ms, on_done)
+
+    def replay_step(self, steps, delay_ms, on_done):
+        step = next(steps, None)
+        if step is not None:
+            index, symbol, _ = step
+            self.make_move(index, symbol)
+            self.update_status_indicator(symbol)
+            self.replay_job = self.root.after(delay_ms, self.replay_step, steps, delay_ms, on_done)
+            return
+
+        self.replay_job = None
+        winner = self.board.winner()
+        self.board_view.highlight(self.board.winning_cells())
+        self.status_label.config(
+            text=f"🏁 Replay: {winner} Wins" if winner else "🏁 Replay: Draw",
+            fg=self.colors["x"] if winner == "X" else self.colors["o"] if winner else self.colors["text"]
+        )
+        if on_done is not None:
+            self.replay_job = self.root.after(REPLAY_PAUSE_MS, on_done)
+
+    def replay_games(self, games, delay_ms=REPLAY_MOVE_MS):
+        game = next(games, None)
+        if game is not None:
+            self.replay_game(game, delay_ms, lambda: self.replay_games(games, delay_ms))
+
+    def build_spectate_controls(self):
+        if self.spectate_controls:
+            return
+        self.spectate_controls = True
+        for text, variable, values in (
+            ("X:", self.spectate_x, list(engine.DIFFICULTIES)),
+            ("O:", self.spectate_o, list(engine.DIFFICULTIES)),
+            ("Speed:", self.spectate_speed, list(spectator.SPEEDS))
+        ):
+            tk.Label(
+                self.spectate_frame,
+                text=text,
+                font=self.fonts["label"],
+                fg="#cbd5e1",
+                bg=self.colors["bg"]
+            ).pack(side=tk.LEFT, padx=(10, 5))
+            combo = ttk.Combobox(
+                self.spectate_frame,
+                values=values,
+                textvariable=variable,
+                state="readonly",
+                width=9,
+                font=self.fonts["combo"]
+            )
+            combo.pack(side=tk.LEFT)
+            if variable is not self.spectate_speed:
+                combo.bind("<<ComboboxSelected>>", lambda e: self.restart_spectating())
+
+    def toggle_spectating(self):
+        if self.spectating.get():
+            self.start_spectating()
+        else:
+            self.reset_game()
+            self.status_label.config(text="🎮 Your Turn (X)", fg=self.colors["x"])
+
+    def start_spectating(self):
+        self.build_spectate_controls()
+        self.reset_game()
+        self.spectating.set(True)
+        self.game_active = False
+        # The games are played on the AI worker with a board of their own; the frame tick only draws.
+        self.spectator = spectator.Spectator(
+            self.board.copy(), self.spectate_x.get(), self.spectate_o.get(),
+            spectator.SPEEDS[self.spectate_speed.get()], searchers=self.ai_searchers
+        )
+        self.spectate_stop = threading.Event()
+        self.spectate_future = self.ai_executor.submit(self.spectator.run, self.spectate_stop)
+        self.status_label.config(text="🎬 AI vs AI", fg=self.colors["accent"])
+        self.spectate_scored = time.perf_counter()
+        self.spectate_job = self.root.after(spectator.FRAME_MS, self.spectate_frame_tick)
+
+    def restart_spectating(self):
+        if self.spectator is not None:
+            self.start_spectating()
+
+    def spectate_frame_tick(self):
+        if self.spectate_future.done():
+            # run only returns once it is stopped, so finishing on its own means it failed.
+            error = self.spectate_future.exception()
+            self.reset_game()
+            self.status_label.config(text="🎮 Your Turn (X)", fg=self.colors["x"])
+            messagebox.showwarning("AI vs AI", f"AI vs AI stopped after an error:\n{error!r}")
+            return
+        now = time.perf_counter()
+        watched = self.spectator
+        watched.speed = spectator.SPEEDS[self.spectate_speed.get()]
+        if watched.position is not self.board:
+            self.board = board = watched.position
+            self.board_view.set_position([board[i] or "" for i in range(len(board))], board.winning_cells())
+            self.update_regions()
+            self.update_analysis()
+        if (now - self.spectate_scored) * 1000 >= spectator.SCORE_INTERVAL_MS:
+            self.spectate_scored = now
+            self.score_label.config(text=watched.score_text())
+        self.spectate_job = self.root.after(spectator.FRAME_MS, self.spectate_frame_tick)
+
+    def cancel_spectating(self):
+        if self.spectate_job is not None:
+            self.root.after_cancel(self.spectate_job)
+            self.spectate_job = None
+        if self.spectate_stop is not None:
+            self.spectate_stop.set()
+            self.spectate_stop = None
+        self.spectate_future = None
+        if self.spectator is not None:
+            self.spectator = None
+            self.spectating.set(False)
+            self.update_score()
+
+    def cancel_replay(self):
+        if self.replay_job is not None:
+            self.root.after_cancel(self.replay_job)
+            self.replay_job = None
+
     def reset_game(self):
-        self.board = [""] * 9
+        self.cancel_ai_move()
+        self.cancel_replay()
+        self.cancel_spectating()
+        self.board.clear()
+        self.timeline = gamestate.Timeline(gamestate.GameState(self.board.geometry))
+        self.ai_latencies = {}
+        self.ply_choice.set("Start")
+        self.branch_choice.set("")
         self.game_active = True
         self.current_turn = "X"
         self.update_status_indicator("X")
-        for btn in self.buttons:
-            btn.config(
-                text="", 
-                bg=self.colors["button"],
-                relief="flat",
-                bd=0
-            )
+        self.board_view.clear()
+        self.update_analysis()
 
     def update_score(self):
         self.score_label.config(text=self.get_score_text())
@@ -593,6 +944,8 @@ class TicTacToeApp:
 
 🛡️ Current Difficulty: {self.difficulty.get()}
 🎮 Current Turn: {self.current_turn}
+{self.get_timing_text()}
+{self.get_history_text()}
 
 {'🔥 Hot Streak!' if self.player_score > self.ai_score else 
  '💡 Keep Trying!' if self.player_score == self.ai_score else 
@@ -606,12 +959,96 @@ class TicTacToeApp:
         if response:
             self.start_next_round()
 
+    def get_timing_text(self):
+        if not self.telemetry.count:
+            return "⏱️ AI Move Time: no moves yet"
+        p = self.telemetry.percentiles()
+        return (f"⏱️ AI Move Time (last {len(self.telemetry.window)}): "
+                f"p50 {p[50]:.1f} ms | p95 {p[95]:.1f} ms | p99 {p[99]:.1f} ms")
+
+    def get_history_text(self):
+        if self.history is None:
+            return ""
+        difficulty = self.difficulty.get()
+        overall = self.history.summary(difficulty)
+        recent = self.history.window(7, difficulty)
+        streak = overall["streak"]
+        streak_text = (f"{streak} wins" if streak > 0 else
+                       f"{-streak} losses" if streak < 0 else "none")
+        return (f"📚 All-Time on {difficulty}: {overall['games']} games | "
+                f"{overall['win_rate']:.1f}% won | best streak {overall['best_streak']}\n"
+                f"📅 Last 7 Days: {recent['games']} games | {recent['win_rate']:.1f}% won | "
+                f"current streak {streak_text}")
+
     def exit_game(self):
-        if messagebox.askyesno("Exit Game", "Are you sure you want to exit?\n\nYour current scores will be lost."):
+        message = ("Are you sure you want to exit?\n\nYour match history is saved."
+                   if self.history is not None else
+                   "Are you sure you want to exit?\n\nYour current scores will be lost.")
+        if messagebox.askyesno("Exit Game", message):
+            self.cancel_ai_move()
+            self.cancel_spectating()
+            self.ai_executor.shutdown(wait=False, cancel_futures=True)
+            self.telemetry.close()
+            if self.history is not None:
+                try:
+                    self.history.close()
+                except sqlite3.Error as exc:
+                    messagebox.showwarning("Match History", f"Some games could not be saved:\n{exc}")
+            if self.recorder is not None:
+                self.recorder.close()
             self.root.destroy()
             sys.exit()
 
-if __name__ == "__main__":
+def main(argv=None):
+    # The terminal front ends are handed over to before anything the window needs is imported.
+    front = argparse.ArgumentParser(add_help=False)
+    front.add_argument("--terminal", action="store_true")
+    front.add_argument("--headless", action="store_true")
+    known, rest = front.parse_known_args(argv)
+    if known.terminal or known.headless:
+        return terminal.main(rest + ["--headless"] if known.headless else rest)
+
+    load_tk()
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe against the AI.")
+    parser.add_argument("--terminal", action="store_true",
+                        help="play in the terminal instead of a window; other options go to terminal.py")
+    parser.add_argument("--headless", action="store_true",
+                        help="print the AI's move as JSON without a display (see terminal.py --help)")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="append per-move AI telemetry to PATH as JSON lines")
+    parser.add_argument("--history", metavar="PATH", default=history.DEFAULT_PATH,
+                        help="SQLite file for match history (default: %(default)s)")
+    parser.add_argument("--no-history", action="store_true", help="do not record match history")
+    parser.add_argument("--record", metavar="PATH", help="append finished games to a binary record file")
+    parser.add_argument("--replay", metavar="PATH", help="replay the games stored in a binary record file")
+    parser.add_argument("--analysis", action="store_true",
+                        help="start with the per-cell analysis overlay turned on")
+    parser.add_argument("--spectate", nargs=2, metavar=("X_POLICY", "O_POLICY"), choices=engine.DIFFICULTIES,
+                        help="start watching two AI difficulties play each other")
+    parser.add_argument("--speed", choices=list(spectator.SPEEDS), default="Normal",
+                        help="AI-vs-AI speed (default: %(default)s)")
+    parser.add_argument("--replay-delay", metavar="MS", type=int, default=REPLAY_MOVE_MS,
+                        help="delay between replayed moves (default: %(default)s)")
+    args = parser.parse_args(argv)
+
     root = tk.Tk()
-    app = TicTacToeApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = TicTacToeApp(
+        root,
+        Telemetry(path=args.telemetry),
+        None if args.no_history else history.HistoryStore(args.history),
+        records.RecordWriter(args.record) if args.record else None,
+        args.analysis
+    )
+    if args.spectate:
+        app.spectate_x.set(args.spectate[0])
+        app.spectate_o.set(args.spectate[1])
+        app.spectate_speed.set(args.speed)
+        app.start_spectating()
+    if args.replay:
+        app.replay_games(records.read_games(args.replay), args.replay_delay)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import argparse
+import sys
+import time
+from collections import OrderedDict
+
+import engine
+import tablebase
+from tablebase import DRAW, LOSS, WIN, entry_score, parent_entry
+
+DEFAULT_MAX_ENTRIES = 200000
+OUTCOME_LETTERS = {WIN: "W", DRAW: "D", LOSS: "L"}
+IMMEDIATE_WIN = 1 << 2 | WIN
+
+
+class Evaluator:
+    # Exact values of every move in a position: (outcome, plies to the end) packed as in tablebase,
+    # from the point of view of the player making the move. Solving a position fills the cache for
+    # every position below it, so the next turn's analysis is usually already there.
+    def __init__(self, geometry, max_entries=DEFAULT_MAX_ENTRIES):
+        self.geometry = geometry
+        self.max_entries = max_entries
+        self.table = tablebase.load(geometry)
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def available(self):
+        return self.geometry.cells <= engine.LOOKUP_TABLE_CELLS or self.table is not None
+
+    def analyse(self, mover, opponent):
+        key = (mover, opponent)
+        cache = self.cache
+        children = cache.get(key)
+        if children is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return children
+
+        self.misses += 1
+        geometry = self.geometry
+        children = {}
+        for cell in geometry.empty_cells(mover | opponent):
+            moved = mover | 1 << cell
+            if geometry.is_win_through(moved, cell):
+                children[cell] = IMMEDIATE_WIN
+            else:
+                children[cell] = parent_entry(self.value(opponent, moved))
+
+        cache[key] = children
+        if len(cache) > self.max_entries:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return children
+
+    def value(self, mover, opponent):
+        if self.table is not None:
+            return self.table.entry(mover, opponent)
+        children = self.analyse(mover, opponent)
+        if not children:
+            return DRAW
+        return max(children.values(), key=entry_score)
+
+    def analyse_board(self, board, mover, opponent):
+        if board.is_over():
+            return {}
+        return self.analyse(board.mask(mover), board.mask(opponent))
+
+
+_evaluators = {}
+
+
+def evaluator_for(geometry):
+    evaluator = _evaluators.get(geometry)
+    if evaluator is None:
+        evaluator = _evaluators[geometry] = Evaluator(geometry)
+    return evaluator
+
+
+def describe(entry):
+    letter = OUTCOME_LETTERS.get(entry & 3, "?")
+    return letter if letter == "D" else f"{letter}{entry >> 2}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the exact value of every move in a position.")
+    parser.add_argument("board", nargs="?", default=None,
+                        help="cells row by row as X, O or . (default: the empty board)")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    cells = args.board or "." * geometry.cells
+    if len(cells) != geometry.cells or set(cells) - set("XO."):
+        parser.error(f"board must be {geometry.cells} characters of X, O and .")
+    board = engine.Board(geometry=geometry)
+    for index, symbol in enumerate(cells):
+        if symbol != ".":
+            board.place(index, symbol)
+    mover = "X" if cells.count("X") == cells.count("O") else "O"
+    other = "O" if mover == "X" else "X"
+
+    evaluator = evaluator_for(geometry)
+    if not evaluator.available():
+        print(f"No exact analysis for {geometry.name}: it needs a tablebase (see tablebase.py)")
+        return 1
+    started = time.perf_counter()
+    children = evaluator.analyse_board(board, mover, other)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    evaluator.analyse_board(board, mover, other)
+    warm = time.perf_counter() - started
+
+    for row in range(geometry.size):
+        print(" ".join(
+            f"{cells[index] if index not in children else describe(children[index]):>4}"
+            for index in range(row * geometry.size, (row + 1) * geometry.size)
+        ))
+    print(f"{mover} to move | first analysis {cold * 1000:.1f} ms, cached {warm * 1e6:.1f} µs, "
+          f"{len(evaluator.cache)} positions cached")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
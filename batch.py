@@ -0,0 +1,183 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import engine
+
+EMPTY = 0
+X = 1
+O = 2
+
+SYMBOLS = {"X": X, "O": O}
+
+
+class BatchEvaluator:
+    def __init__(self, geometry=engine.CLASSIC):
+        self.geometry = geometry
+        self.lines = np.array(geometry.win_lines, dtype=np.intp)
+        self.powers = np.array([1 << i for i in range(geometry.cells)], dtype=np.int64)
+        self.win_masks = np.array(geometry.win_masks, dtype=np.int64)
+        self.preferred = np.array(geometry.preferred, dtype=np.intp)
+        self.wins = None
+        if geometry.wins is not None:
+            self.wins = np.frombuffer(geometry.wins, dtype=np.uint8).astype(bool)
+
+    def masks(self, boards, piece):
+        return (boards == piece).astype(np.int64) @ self.powers
+
+    def has_won(self, masks):
+        if self.wins is not None:
+            return self.wins[masks]
+        return ((masks[:, None] & self.win_masks) == self.win_masks).any(axis=1)
+
+    def evaluate(self, boards):
+        boards = np.asarray(boards, dtype=np.int8)
+        x_won = self.has_won(self.masks(boards, X))
+        o_won = self.has_won(self.masks(boards, O))
+        legal = boards == EMPTY
+
+        winners = np.zeros(len(boards), dtype=np.int8)
+        winners[o_won] = O
+        winners[x_won] = X
+        terminal = x_won | o_won | ~legal.any(axis=1)
+        legal &= ~(x_won | o_won)[:, None]
+        return winners, terminal, legal
+
+    def winners(self, boards):
+        return self.evaluate(boards)[0]
+
+    def completing_cells(self, boards, piece):
+        empty_in_line = boards[:, self.lines] == EMPTY
+        own_in_line = (boards[:, self.lines] == piece).sum(axis=2)
+        completing = (own_in_line == self.geometry.win_length - 1) & (empty_in_line.sum(axis=2) == 1)
+        marks = completing[:, :, None] & empty_in_line
+
+        cells = np.zeros(boards.shape, dtype=bool)
+        for index, line in enumerate(self.lines):
+            cells[:, line] |= marks[:, index, :]
+        return cells
+
+    def random_moves(self, boards, rng):
+        boards = np.asarray(boards, dtype=np.int8)
+        noise = rng.random(boards.shape)
+        noise[boards != EMPTY] = -1.0
+        return noise.argmax(axis=1)
+
+    def greedy_moves(self, boards, ai="O", player="X", rng=None, hard=False):
+        boards = np.asarray(boards, dtype=np.int8)
+        rng = np.random.default_rng() if rng is None else rng
+        moves = self.random_moves(boards, rng)
+
+        if hard:
+            preferred_empty = boards[:, self.preferred] == EMPTY
+            has_preferred = preferred_empty.any(axis=1)
+            moves = np.where(has_preferred, self.preferred[preferred_empty.argmax(axis=1)], moves)
+
+        block = self.completing_cells(boards, SYMBOLS[player])
+        has_block = block.any(axis=1)
+        moves = np.where(has_block, block.argmax(axis=1), moves)
+
+        win = self.completing_cells(boards, SYMBOLS[ai])
+        has_win = win.any(axis=1)
+        return np.where(has_win, win.argmax(axis=1), moves)
+
+    def ai_moves(self, boards, difficulty, ai="O", player="X", rng=None):
+        rng = np.random.default_rng() if rng is None else rng
+        if difficulty == "Easy":
+            return self.random_moves(boards, rng)
+        if difficulty in ("Medium", "Hard"):
+            return self.greedy_moves(boards, ai, player, rng, hard=difficulty == "Hard")
+        raise ValueError(f"No vectorized policy for difficulty: {difficulty}")
+
+
+def to_array(boards, geometry=engine.CLASSIC):
+    array = np.zeros((len(boards), geometry.cells), dtype=np.int8)
+    for row, board in enumerate(boards):
+        for i in range(geometry.cells):
+            array[row, i] = SYMBOLS.get(board[i], EMPTY)
+    return array
+
+
+def from_array(array, geometry=engine.CLASSIC):
+    boards = []
+    for row in np.asarray(array):
+        board = engine.Board(geometry=geometry)
+        for i, piece in enumerate(row):
+            if piece == X:
+                board.place(i, "X")
+            elif piece == O:
+                board.place(i, "O")
+        boards.append(board)
+    return boards
+
+
+def random_positions(count, geometry=engine.CLASSIC, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    order = rng.random((count, geometry.cells)).argsort(axis=1)
+    plies = rng.integers(0, geometry.cells + 1, size=count)
+    rank = np.empty_like(order)
+    rank[np.arange(count)[:, None], order] = np.arange(geometry.cells)
+    boards = np.where(rank % 2 == 0, X, O).astype(np.int8)
+    boards[rank >= plies[:, None]] = EMPTY
+    return boards
+
+
+def check_consistency(evaluator, boards):
+    winners, terminal, legal = evaluator.evaluate(boards)
+    medium = evaluator.greedy_moves(boards, hard=False)
+    hard = evaluator.greedy_moves(boards, hard=True)
+    mismatches = 0
+    for row, board in enumerate(from_array(boards, evaluator.geometry)):
+        winner = board.winner()
+        expected_legal = [] if winner else board.empty()
+        if (winners[row] != SYMBOLS.get(winner, EMPTY) or terminal[row] != board.is_over()
+                or list(np.flatnonzero(legal[row])) != expected_legal):
+            mismatches += 1
+            continue
+        if board.is_over():
+            continue
+        occupied = board.occupied
+        forced = engine.winning_move(board.o, occupied, board.geometry)
+        if forced is None:
+            forced = engine.winning_move(board.x, occupied, board.geometry)
+        if forced is not None:
+            if medium[row] != forced or hard[row] != forced:
+                mismatches += 1
+        elif hard[row] != engine.get_ai_move(board, "Hard"):
+            mismatches += 1
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark vectorized batch board evaluation.")
+    parser.add_argument("--boards", type=int, default=1000000)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--check", type=int, default=20000, help="boards to compare with the scalar engine")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    evaluator = BatchEvaluator(geometry)
+    rng = np.random.default_rng(args.seed)
+    boards = random_positions(args.boards, geometry, rng)
+
+    mismatches = check_consistency(evaluator, boards[:args.check])
+    print(f"Consistency: {min(args.check, args.boards)} boards checked, {mismatches} mismatches")
+
+    for name, run in (
+        ("evaluate", lambda: evaluator.evaluate(boards)),
+        ("medium moves", lambda: evaluator.ai_moves(boards, "Medium", rng=rng)),
+        ("hard moves", lambda: evaluator.ai_moves(boards, "Hard", rng=rng)),
+    ):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<13} {args.boards / elapsed:>12,.0f} boards/s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from functools import lru_cache
+
+import engine
+import search
+from telemetry import PERCENTILES, percentile
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 256
+
+
+def _transform(cell, size, rotation, mirror):
+    row, col = divmod(cell, size)
+    if mirror:
+        col = size - 1 - col
+    for _ in range(rotation):
+        row, col = col, size - 1 - row
+    return row * size + col
+
+
+@lru_cache(maxsize=None)
+def symmetries(size):
+    perms = tuple(
+        tuple(_transform(cell, size, rotation, mirror) for cell in range(size * size))
+        for mirror in (False, True)
+        for rotation in range(4)
+    )
+    inverses = []
+    for perm in perms:
+        inverse = [0] * len(perm)
+        for cell, target in enumerate(perm):
+            inverse[target] = cell
+        inverses.append(tuple(inverse))
+    return perms, tuple(inverses)
+
+
+def transform_mask(mask, perm):
+    result = 0
+    while mask:
+        low = mask & -mask
+        result |= 1 << perm[low.bit_length() - 1]
+        mask ^= low
+    return result
+
+
+def canonical(geometry, mover, opponent):
+    if geometry is engine.CLASSIC:
+        return min(
+            ((table[mover], table[opponent]), index)
+            for index, table in enumerate(search.SYMMETRY_MASKS)
+        )
+    perms = symmetries(geometry.size)[0]
+    return min(
+        ((transform_mask(mover, perm), transform_mask(opponent, perm)), index)
+        for index, perm in enumerate(perms)
+    )
+
+
+def solve_batch(geometry, positions, time_budget=engine.DEFAULT_TIME_BUDGET):
+    # Returns a mask of equally good moves per position, mover to play.
+    if geometry is engine.CLASSIC:
+        import perfect_play
+
+        table = perfect_play.load()
+        masks = []
+        for mover, opponent in positions:
+            mask = table.best_moves(mover, opponent)
+            if mask in (perfect_play.NO_ENTRY, 0):
+                mask = 1 << search.best_move(engine.Board(mover, opponent, geometry), "X", "O")
+            masks.append(mask)
+        return masks
+
+    import tablebase
+
+    table = tablebase.load(geometry)
+    searcher = search.timed_search(geometry, time_budget)
+    masks = []
+    for mover, opponent in positions:
+        move = None if table is None else table.best_move(mover, opponent)
+        if move is None:
+            move = searcher.best_move(engine.Board(mover, opponent, geometry), "X", "O")
+        masks.append(1 << move)
+    return masks
+
+
+class BatchStats:
+    __slots__ = ("requests", "unique", "batches", "solve_ms", "wait_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.unique = 0
+        self.batches = 0
+        self.solve_ms = 0.0
+        self.wait_ms = 0.0
+
+    def report(self):
+        batches = self.batches or 1
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": self.requests / batches,
+            "unique_ratio": self.unique / requests,
+            "mean_solve_ms": self.solve_ms / batches,
+            "mean_wait_ms": self.wait_ms / requests
+        }
+
+
+class MoveBatcher:
+    def __init__(self, executor=None, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 time_budget=engine.DEFAULT_TIME_BUDGET):
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.time_budget = time_budget
+        self.pending = {}
+        self.timers = {}
+        # The event loop only keeps weak references to tasks, so pending batches are held here.
+        self.tasks = set()
+        self.stats = BatchStats()
+
+    async def best_move(self, board, ai="O", player="X"):
+        loop = asyncio.get_running_loop()
+        geometry = board.geometry
+        future = loop.create_future()
+        queue = self.pending.setdefault(geometry, [])
+        queue.append((board.mask(ai), board.mask(player), future, time.perf_counter()))
+        if len(queue) >= self.max_batch:
+            self.flush(geometry)
+        elif geometry not in self.timers:
+            self.timers[geometry] = loop.call_later(self.window, self.flush, geometry)
+        return await future
+
+    def flush(self, geometry):
+        timer = self.timers.pop(geometry, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self.pending.pop(geometry, None)
+        if requests:
+            task = asyncio.ensure_future(self.solve(geometry, requests))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def solve(self, geometry, requests):
+        started = time.perf_counter()
+        # Table lookups are cheaper than canonicalizing, so only searched boards fold symmetries.
+        symmetric = geometry.cells > engine.LOOKUP_TABLE_CELLS
+        unique = {}
+        keyed = []
+        for mover, opponent, future, queued in requests:
+            if symmetric:
+                key, symmetry = canonical(geometry, mover, opponent)
+            else:
+                key, symmetry = (mover, opponent), 0
+            keyed.append((unique.setdefault(key, len(unique)), symmetry, future))
+            self.stats.wait_ms += (started - queued) * 1000
+        positions = list(unique)
+
+        try:
+            if self.executor is None or not symmetric:
+                masks = solve_batch(geometry, positions, self.time_budget)
+            else:
+                # One job per unique position: each search gets the full time budget, so a single job
+                # for the whole batch would run them one after another on one worker.
+                loop = asyncio.get_running_loop()
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(self.executor, solve_batch, geometry, [position], self.time_budget)
+                    for position in positions
+                ))
+                masks = [result[0] for result in results]
+        except Exception as exc:
+            for _, _, future in keyed:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        inverses = symmetries(geometry.size)[1]
+        for index, symmetry, future in keyed:
+            mask = masks[index]
+            if symmetry:
+                mask = transform_mask(mask, inverses[symmetry])
+            if not future.done():
+                future.set_result((mask & -mask).bit_length() - 1)
+
+        stats = self.stats
+        stats.requests += len(requests)
+        stats.unique += len(positions)
+        stats.batches += 1
+        stats.solve_ms += (time.perf_counter() - started) * 1000
+
+
+def random_expert_positions(count, geometry, rng, max_ply=None):
+    positions = []
+    max_ply = geometry.cells - 1 if max_ply is None else max_ply
+    while len(positions) < count:
+        board = engine.Board(geometry=geometry)
+        turn = "X"
+        for _ in range(rng.randint(0, max_ply)):
+            board.place(rng.choice(board.empty()), turn)
+            turn = "O" if turn == "X" else "X"
+            if board.is_over():
+                break
+        if not board.is_over():
+            positions.append((board, turn, "O" if turn == "X" else "X"))
+    return positions
+
+
+async def run_benchmark(positions, concurrency, batcher, time_budget=engine.DEFAULT_TIME_BUDGET):
+    latencies = []
+    moves = []
+    queue = iter(positions)
+
+    async def client():
+        for board, ai, player in queue:
+            started = time.perf_counter()
+            if batcher is None:
+                move = engine.get_ai_move(board, "Expert", ai, player, time_budget=time_budget)
+                await asyncio.sleep(0)
+            else:
+                move = await batcher.best_move(board, ai, player)
+            latencies.append((time.perf_counter() - started) * 1000)
+            moves.append(move)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched Expert move requests.")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[0.0, 1.0, DEFAULT_WINDOW_MS, 5.0])
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--max-ply", type=int, default=None, help="deepest position to sample")
+    parser.add_argument("--time-budget", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    positions = random_expert_positions(args.requests, geometry, random.Random(args.seed), args.max_ply)
+    solve_batch(geometry, [])
+
+    print(f"{args.requests} Expert requests on {geometry.name}, {args.concurrency} concurrent callers")
+    runs = [("unbatched", None)] + [
+        (f"window {window:g} ms", MoveBatcher(None, window, args.max_batch, args.time_budget))
+        for window in args.window_ms
+    ]
+    for name, batcher in runs:
+        latencies, elapsed = asyncio.run(run_benchmark(positions, args.concurrency, batcher, args.time_budget))
+        latencies.sort()
+        tails = " | ".join(f"p{pct} {percentile(latencies, pct):.2f} ms" for pct in PERCENTILES)
+        line = f"{name:<16} {len(latencies) / elapsed:>10,.0f} moves/s | {tails}"
+        if batcher is not None:
+            report = batcher.stats.report()
+            line += f" | batch {report['mean_batch']:.0f}, unique {report['unique_ratio']:.0%}"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
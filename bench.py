@@ -0,0 +1,366 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+import types
+from contextlib import contextmanager
+
+import engine
+import search
+import tournament
+from telemetry import PERCENTILES, percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TOLERANCE = 0.15
+# Timings this close together are scheduler noise, whatever the relative change.
+NOISE_FLOOR_MS = 0.05
+MIN_SECONDS = 1.0
+GAME_PAIRS = (("Hard", "Hard"), ("Easy", "Expert"), ("Medium", "Hard"))
+STARTUP_RUNS = 20
+# Cold start of the terminal front end: from exec to the first prompt, answered with "q".
+STARTUP_TARGET_MS = 50.0
+STARTUP_COMMANDS = {
+    "interpreter": ["-c", "pass"],
+    "terminal": ["terminal.py"],
+    "terminal_headless": ["terminal.py", "--headless", "--moves", "4"],
+    "app_headless": ["Tic-Tac-Toe.py", "--headless", "--moves", "4"]
+}
+
+
+def result(value, unit, better="lower", **extra):
+    entry = {"value": value, "unit": unit, "better": better}
+    entry.update(extra)
+    return entry
+
+
+def rate(fn, items, min_seconds=MIN_SECONDS):
+    # Calls fn on every item, repeating the sweep until min_seconds has passed; returns calls/s.
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for item in items:
+            fn(item)
+        calls += len(items)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return calls / elapsed
+
+
+def distribution(name, latencies, unit="ms"):
+    values = sorted(latencies)
+    results = {f"{name}.p{pct}_{unit}": result(percentile(values, pct), unit) for pct in PERCENTILES}
+    results[f"{name}.mean_{unit}"] = result(sum(values) / len(values) if values else 0.0, unit)
+    results[f"{name}.max_{unit}"] = result(values[-1] if values else 0.0, unit)
+    return results
+
+
+def reachable_positions():
+    positions = []
+    seen = set()
+
+    def visit(board, turn):
+        key = (board.x, board.o)
+        if key in seen:
+            return
+        seen.add(key)
+        positions.append(board.copy())
+        if board.is_over():
+            return
+        for i in board.empty():
+            board.place(i, turn)
+            visit(board, "O" if turn == "X" else "X")
+            board.remove(i)
+
+    visit(engine.Board(), "X")
+    return positions
+
+
+def board_text(board):
+    return "".join(board[i] or "." for i in range(len(board)))
+
+
+def bench_check_winner():
+    boards = reachable_positions()
+    return {"check_winner.calls_per_s": result(rate(engine.Board.winner, boards), "calls/s", "higher",
+                                               positions=len(boards))}
+
+
+def bench_ai_moves(difficulties, time_budget, seed):
+    positions = search.ai_turn_positions()
+    rng = random.Random(seed)
+    results = {}
+    for difficulty in difficulties:
+        engine.get_ai_move(engine.Board(), difficulty, "O", "X", rng, time_budget)
+        latencies = []
+        worst = None
+        for board in positions:
+            started = time.perf_counter()
+            engine.get_ai_move(board, difficulty, "O", "X", rng, time_budget)
+            latency = (time.perf_counter() - started) * 1000
+            latencies.append(latency)
+            if worst is None or latency > worst[0]:
+                worst = (latency, board)
+        entries = distribution(f"get_ai_move.{difficulty}", latencies)
+        entries[f"get_ai_move.{difficulty}.max_ms"]["board"] = board_text(worst[1])
+        results.update(entries)
+    return results
+
+
+def bench_minimax():
+    started = time.perf_counter()
+    engine.minimax_best_move(engine.Board(), "X", "O")
+    results = {"minimax_best_move.empty_ms": result((time.perf_counter() - started) * 1000, "ms")}
+
+    latencies = []
+    for cell in range(engine.CELLS):
+        board = engine.Board()
+        board.place(cell, "X")
+        started = time.perf_counter()
+        engine.minimax_best_move(board, "O", "X")
+        latencies.append((time.perf_counter() - started) * 1000)
+    results["minimax_best_move.one_move.mean_ms"] = result(sum(latencies) / len(latencies), "ms")
+    results["minimax_best_move.one_move.max_ms"] = result(max(latencies), "ms")
+    return results
+
+
+def bench_games(time_budget, seed, min_seconds=MIN_SECONDS):
+    results = {}
+    for first, second in GAME_PAIRS:
+        rng = random.Random(seed)
+        games = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < min_seconds:
+            tournament.play_game(first, second, engine.CLASSIC, rng, time_budget)
+            games += 1
+        results[f"games.{first}_vs_{second}.games_per_s"] = result(
+            games / (time.perf_counter() - started), "games/s", "higher")
+    return results
+
+
+@contextmanager
+def virtual_display():
+    if os.environ.get("DISPLAY"):
+        yield
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise RuntimeError("no DISPLAY and Xvfb is not installed")
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               pass_fds=(write_fd,), stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    try:
+        display = os.read(read_fd, 32).decode().strip()
+        if not display:
+            raise RuntimeError("Xvfb did not start")
+        os.environ["DISPLAY"] = f":{display}"
+        yield
+    finally:
+        os.close(read_fd)
+        os.environ.pop("DISPLAY", None)
+        process.terminate()
+        process.wait()
+
+
+def bench_startup(runs=STARTUP_RUNS):
+    # Best of several fresh interpreters, run round-robin so a noisy stretch hits every command alike.
+    times = {name: [] for name in STARTUP_COMMANDS}
+    for _ in range(runs):
+        for name, command in STARTUP_COMMANDS.items():
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *command], cwd=BASE_DIR, input=b"q\n", stdout=subprocess.DEVNULL,
+                           check=True)
+            times[name].append((time.perf_counter() - started) * 1000)
+    results = {
+        f"startup.{name}_ms": result(min(values), "ms", median=sorted(values)[runs // 2])
+        for name, values in times.items()
+    }
+    terminal = results["startup.terminal_ms"]
+    terminal["target"] = STARTUP_TARGET_MS
+    if terminal["value"] > STARTUP_TARGET_MS:
+        print(f"startup: terminal front end took {terminal['value']:.1f} ms, target {STARTUP_TARGET_MS:.0f} ms",
+              file=sys.stderr)
+    return results
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("tictactoe_app", os.path.join(BASE_DIR, "Tic-Tac-Toe.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_gui(module, root, rounds=50, storm_events=500):
+    app = module.TicTacToeApp(root)
+    root.update()
+    moves = []
+    resets = []
+    for _ in range(rounds):
+        for index in range(engine.CELLS):
+            started = time.perf_counter()
+            app.make_move(index, "X" if index % 2 == 0 else "O")
+            root.update_idletasks()
+            moves.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        app.reset_game()
+        root.update_idletasks()
+        resets.append((time.perf_counter() - started) * 1000)
+
+    storms = []
+    for round_number in range(rounds // 10 or 1):
+        width, height = app.window_width, app.window_height
+        started = time.perf_counter()
+        for step in range(1, storm_events + 1):
+            grow = step if round_number % 2 == 0 else -step
+            app.on_window_resize(types.SimpleNamespace(widget=root, width=width + grow // 4, height=height + grow // 4))
+        while app.resize_job is not None:
+            root.update()
+        root.update_idletasks()
+        storms.append((time.perf_counter() - started) * 1000)
+
+    results = {}
+    results.update(distribution("gui.make_move", moves))
+    results.update(distribution("gui.reset_game", resets))
+    results.update(distribution("gui.configure_storm", storms))
+    results["gui.configure_storm.mean_ms"]["events"] = storm_events
+    app.ai_executor.shutdown(wait=False, cancel_futures=True)
+    root.destroy()
+    return results
+
+
+def run_gui_benchmarks():
+    with virtual_display():
+        module = load_app_module()
+        return bench_gui(module, module.load_tk().Tk())
+
+
+def run(args):
+    results = {}
+    sections = [
+        ("check_winner", bench_check_winner),
+        ("get_ai_move", lambda: bench_ai_moves(args.difficulties, args.time_budget, args.seed)),
+        ("minimax_best_move", bench_minimax),
+        ("games", lambda: bench_games(args.time_budget, args.seed)),
+        ("startup", bench_startup),
+    ]
+    if args.gui:
+        sections.append(("gui", run_gui_benchmarks))
+
+    skipped = {}
+    for name, section in sections:
+        started = time.perf_counter()
+        try:
+            results.update(section())
+        except (RuntimeError, ImportError) as exc:
+            skipped[name] = str(exc)
+            print(f"{name:<18} skipped: {exc}", file=sys.stderr)
+            continue
+        print(f"{name:<18} {time.perf_counter() - started:6.1f} s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time_budget": args.time_budget,
+            "seed": args.seed,
+            "skipped": skipped
+        },
+        "results": results
+    }
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    rows = []
+    regressions = []
+    for name, entry in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, None, entry["value"], None, "new"))
+            continue
+        old, new = base["value"], entry["value"]
+        change = (new - old) / old if old else 0.0
+        if entry["unit"] == "ms" and abs(new - old) < NOISE_FLOOR_MS:
+            change = 0.0
+        worse = change < -tolerance if entry["better"] == "higher" else change > tolerance
+        better = change > tolerance if entry["better"] == "higher" else change < -tolerance
+        status = "REGRESSION" if worse else "improved" if better else ""
+        if worse:
+            regressions.append(name)
+        rows.append((name, old, new, change, status))
+    return rows, regressions
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    return f"{value:,.0f}" if value >= 1000 else f"{value:.4g}"
+
+
+def print_comparison(rows, tolerance):
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"{'benchmark':<{width}} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, old, new, change, status in rows:
+        change_text = "-" if change is None else f"{change:+.1%}"
+        print(f"{name:<{width}} {format_value(old):>14} {format_value(new):>14} {change_text:>8} {status}")
+    print(f"Tolerance {tolerance:.0%}")
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine, AI policies and (optionally) the GUI.")
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help="compare: BASELINE [CURRENT]; without CURRENT the benchmarks run first")
+    parser.add_argument("--output", "-o", metavar="PATH", help="run: write results here instead of stdout")
+    parser.add_argument("--gui", action="store_true", help="also time the Tk hot paths, under Xvfb if there is no display")
+    parser.add_argument("--difficulties", nargs="+", choices=engine.DIFFICULTIES, default=list(engine.DIFFICULTIES))
+    parser.add_argument("--time-budget", type=float, default=0.01, help="seconds per MCTS move")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative change that counts as a regression (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare" and not 1 <= len(args.paths) <= 2:
+        parser.error("compare needs BASELINE and optionally CURRENT")
+    if args.command == "run" and args.paths:
+        parser.error("run takes no paths; use --output")
+
+    if args.command == "compare" and len(args.paths) == 2:
+        current = load_results(args.paths[1])
+    else:
+        current = run(args)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+                f.write("\n")
+        elif args.command == "run":
+            json.dump(current, sys.stdout, indent=2)
+            print()
+
+    if args.command == "run":
+        return 0
+    rows, regressions = compare(load_results(args.paths[0]), current, args.tolerance)
+    print_comparison(rows, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import tkinter as tk
+
+GAP = 6
+BLOCK_GAP = 8
+
+
+class BoardCanvas:
+    def __init__(self, parent, colors, font, size=3, on_click=None, is_active=None, block=None, note_font=None):
+        self.colors = colors
+        self.font = font
+        self.note_font = note_font or font
+        self.on_click = on_click
+        self.is_active = is_active or (lambda: True)
+
+        self.canvas = tk.Canvas(
+            parent,
+            bg=colors["card"],
+            highlightthickness=0,
+            bd=0,
+            cursor="hand2"
+        )
+        self.canvas.bind("<Button-1>", self.on_press)
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<Leave>", self.on_leave)
+
+        self.pixel_size = 0
+        self.cell_size = 0
+        self.set_size(size, block)
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def destroy(self):
+        self.canvas.destroy()
+
+    def set_size(self, size, block=None):
+        self.canvas.delete("all")
+        self.size = size
+        self.block = block
+        self.cells = size * size
+        self.marks = [""] * self.cells
+        self.win_cells = set()
+        self.inactive = set()
+        self.owners = {}
+        self.notes = {}
+        self.hover = None
+        self.dirty = set()
+        self.rects = [
+            self.canvas.create_rectangle(0, 0, 0, 0, fill=self.colors["button"], outline="", width=0)
+            for _ in range(self.cells)
+        ]
+        self.texts = [
+            self.canvas.create_text(0, 0, text="", font=self.font, fill=self.colors["text"])
+            for _ in range(self.cells)
+        ]
+        # Created on the first annotation, since most games never show any.
+        self.note_texts = None
+        if self.pixel_size:
+            self.resize(self.pixel_size)
+
+    def resize(self, pixel_size):
+        self.pixel_size = pixel_size
+        block_gaps = self.size // self.block - 1 if self.block else 0
+        self.cell_size = (pixel_size - GAP * (self.size + 1) - BLOCK_GAP * block_gaps) / self.size
+        self.canvas.config(width=pixel_size, height=pixel_size)
+        for i in range(self.cells):
+            x0, y0, x1, y1 = self.cell_bounds(i)
+            self.canvas.coords(self.rects[i], x0, y0, x1, y1)
+            self.canvas.coords(self.texts[i], (x0 + x1) / 2, (y0 + y1) / 2)
+            if self.note_texts is not None:
+                self.canvas.coords(self.note_texts[i], (x0 + x1) / 2, (y0 + y1) / 2)
+
+    def offset(self, position):
+        start = GAP + position * (self.cell_size + GAP)
+        if self.block:
+            start += position // self.block * BLOCK_GAP
+        return start
+
+    def grid_position(self, index):
+        # Blocked boards number their cells block by block, as ultimate.UltimateBoard does.
+        if not self.block:
+            return divmod(index, self.size)
+        block = self.block
+        block_row, block_col = divmod(index // (block * block), self.size // block)
+        cell_row, cell_col = divmod(index % (block * block), block)
+        return block_row * block + cell_row, block_col * block + cell_col
+
+    def grid_index(self, row, col):
+        if not self.block:
+            return row * self.size + col
+        block = self.block
+        block_index = row // block * (self.size // block) + col // block
+        return block_index * block * block + row % block * block + col % block
+
+    def cell_bounds(self, index):
+        row, col = self.grid_position(index)
+        x0 = self.offset(col)
+        y0 = self.offset(row)
+        return x0, y0, x0 + self.cell_size, y0 + self.cell_size
+
+    def position_at(self, coordinate):
+        for position in range(self.size):
+            start = self.offset(position)
+            if coordinate < start:
+                return None
+            if coordinate <= start + self.cell_size:
+                return position
+        return None
+
+    def cell_at(self, x, y):
+        if self.cell_size <= 0:
+            return None
+        row = self.position_at(y)
+        col = self.position_at(x)
+        if row is None or col is None:
+            return None
+        return self.grid_index(row, col)
+
+    def on_press(self, event):
+        index = self.cell_at(event.x, event.y)
+        if index is not None and self.on_click is not None:
+            self.on_click(index)
+
+    def on_motion(self, event):
+        index = self.cell_at(event.x, event.y)
+        if index != self.hover:
+            self.set_hover(index)
+
+    def on_leave(self, event):
+        self.set_hover(None)
+
+    def set_hover(self, index):
+        if self.hover is not None:
+            self.dirty.add(self.hover)
+        self.hover = index
+        if index is not None:
+            self.dirty.add(index)
+        self.redraw()
+
+    def set_mark(self, index, symbol):
+        if self.marks[index] != symbol:
+            self.marks[index] = symbol
+            self.dirty.add(index)
+            self.redraw()
+
+    def set_position(self, marks, win_cells):
+        # Brings every cell up to date with one redraw, however many moves happened since the last.
+        for i, mark in enumerate(marks):
+            if self.marks[i] != mark:
+                self.marks[i] = mark
+                self.dirty.add(i)
+        win_cells = set(win_cells)
+        self.dirty |= win_cells ^ self.win_cells
+        self.win_cells = win_cells
+        self.redraw()
+
+    def highlight(self, cells):
+        cells = set(cells)
+        self.dirty |= cells ^ self.win_cells
+        self.win_cells = cells
+        self.redraw()
+
+    def set_regions(self, inactive, owners):
+        self.dirty |= inactive ^ self.inactive
+        self.dirty.update(i for i in owners.keys() | self.owners.keys() if owners.get(i) != self.owners.get(i))
+        self.inactive = inactive
+        self.owners = owners
+        self.redraw()
+
+    def set_notes(self, notes):
+        # Small per-cell annotations shown on empty cells, e.g. the analysis overlay.
+        if self.note_texts is None:
+            if not notes:
+                return
+            self.note_texts = [
+                self.canvas.create_text(0, 0, text="", font=self.note_font, fill=self.colors["text"])
+                for _ in range(self.cells)
+            ]
+            if self.pixel_size:
+                self.resize(self.pixel_size)
+        self.dirty.update(i for i in notes.keys() | self.notes.keys() if notes.get(i) != self.notes.get(i))
+        self.notes = notes
+        self.redraw()
+
+    def clear(self):
+        self.dirty.update(i for i in range(self.cells) if self.marks[i])
+        self.dirty |= self.win_cells | self.inactive | self.owners.keys() | self.notes.keys()
+        if self.hover is not None:
+            self.dirty.add(self.hover)
+        self.marks = [""] * self.cells
+        self.win_cells = set()
+        self.inactive = set()
+        self.owners = {}
+        self.notes = {}
+        self.redraw()
+
+    def redraw(self):
+        colors = self.colors
+        active = self.is_active()
+        for i in self.dirty:
+            mark = self.marks[i]
+            owner = self.owners.get(i)
+            outline, width = (colors["x"] if owner == "X" else colors["o"], 2) if owner else ("", 0)
+            if i in self.win_cells:
+                fill, outline, width = colors["win"], colors["text"], 3
+            elif i in self.inactive and not mark:
+                fill = colors["bg"]
+            elif i == self.hover and not mark and active:
+                fill = colors["button_hover"]
+            else:
+                fill = colors["button"]
+            self.canvas.itemconfig(self.rects[i], fill=fill, outline=outline, width=width)
+            self.canvas.itemconfig(
+                self.texts[i],
+                text=mark,
+                fill=colors["x"] if mark == "X" else colors["o"]
+            )
+            if self.note_texts is not None:
+                note = self.notes.get(i) if not mark else None
+                text, color = note or ("", colors["text"])
+                self.canvas.itemconfig(self.note_texts[i], text=text, fill=color)
+        self.dirty.clear()
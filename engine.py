@@ -0,0 +1,482 @@
+import random
+
+DIFFICULTIES = ("Easy", "Medium", "Hard", "Expert", "MCTS", "Adaptive")
+PREFERRED = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+BOARD_VARIANTS = {
+    "3×3": (3, 3),
+    "4×4": (4, 4),
+    "5×5 (4 in a row)": (5, 4),
+    "7×7 (5 in a row)": (7, 5)
+}
+
+DEFAULT_TIME_BUDGET = 1.0
+
+# Exact win tables are only built up to this many cells (2 ** cells entries each).
+LOOKUP_TABLE_CELLS = 9
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class Geometry:
+    def __init__(self, size=3, win_length=None):
+        win_length = size if win_length is None else win_length
+        if size < 3 or not 3 <= win_length <= size:
+            raise ValueError(f"Unsupported board: {size}x{size} with {win_length} in a row")
+
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+
+        lines = []
+        for d_row, d_col in DIRECTIONS:
+            for row in range(size):
+                for col in range(size):
+                    end_row = row + d_row * (win_length - 1)
+                    end_col = col + d_col * (win_length - 1)
+                    if 0 <= end_row < size and 0 <= end_col < size:
+                        lines.append(tuple(
+                            (row + d_row * step) * size + col + d_col * step
+                            for step in range(win_length)
+                        ))
+        self.win_lines = tuple(lines)
+        self.win_masks = tuple(sum(1 << i for i in line) for line in self.win_lines)
+        self.lines_through = tuple(
+            tuple(mask for mask in self.win_masks if mask >> cell & 1)
+            for cell in range(self.cells)
+        )
+        self.line_ids_through = tuple(
+            tuple(line for line, mask in enumerate(self.win_masks) if mask >> cell & 1)
+            for cell in range(self.cells)
+        )
+
+        self.neighbors = tuple(
+            sum(
+                1 << (r * size + c)
+                for r in range(max(0, row - 1), min(size, row + 2))
+                for c in range(max(0, col - 1), min(size, col + 2))
+            )
+            for row, col in (divmod(cell, size) for cell in range(self.cells))
+        )
+
+        center = (size - 1) / 2
+        if size == 3:
+            self.preferred = PREFERRED
+        else:
+            self.preferred = tuple(sorted(
+                range(self.cells),
+                key=lambda cell: ((cell // size - center) ** 2 + (cell % size - center) ** 2, cell)
+            ))
+
+        if self.cells <= LOOKUP_TABLE_CELLS:
+            self.win_cells_table = tuple(self._win_cells(mask) for mask in range(self.full_mask + 1))
+            self.wins = bytes(bool(cells) for cells in self.win_cells_table)
+        else:
+            self.win_cells_table = None
+            self.wins = None
+
+    def __repr__(self):
+        return f"Geometry({self.size}, {self.win_length})"
+
+    @property
+    def name(self):
+        return f"{self.size}x{self.size}/{self.win_length}"
+
+    def __eq__(self, other):
+        return isinstance(other, Geometry) and (self.size, self.win_length) == (other.size, other.win_length)
+
+    def __hash__(self):
+        return hash((self.size, self.win_length))
+
+    def __reduce__(self):
+        return geometry_for, (self.size, self.win_length)
+
+    def _win_cells(self, mask):
+        cells = set()
+        for line, win in zip(self.win_lines, self.win_masks):
+            if mask & win == win:
+                cells.update(line)
+        return tuple(sorted(cells))
+
+    def is_win(self, mask):
+        if self.wins is not None:
+            return self.wins[mask]
+        for win in self.win_masks:
+            if mask & win == win:
+                return True
+        return False
+
+    def is_win_through(self, mask, cell):
+        for win in self.lines_through[cell]:
+            if mask & win == win:
+                return True
+        return False
+
+    def win_cells(self, mask):
+        if self.win_cells_table is not None:
+            return self.win_cells_table[mask]
+        return self._win_cells(mask)
+
+    def empty_cells(self, occupied):
+        return [i for i in range(self.cells) if not occupied >> i & 1]
+
+
+_geometries = {}
+
+
+def geometry_for(size=3, win_length=None):
+    key = (size, size if win_length is None else win_length)
+    geometry = _geometries.get(key)
+    if geometry is None:
+        geometry = _geometries[key] = Geometry(*key)
+    return geometry
+
+
+CLASSIC = geometry_for(3, 3)
+
+SIZE = CLASSIC.size
+CELLS = CLASSIC.cells
+FULL_MASK = CLASSIC.full_mask
+WIN_LINES = CLASSIC.win_lines
+WIN_MASKS = CLASSIC.win_masks
+WINS = CLASSIC.wins
+
+
+def empty_cells(occupied):
+    return CLASSIC.empty_cells(occupied)
+
+
+class Board:
+    # Besides the bitmasks, each player keeps piece counts per win line, the set of
+    # completed lines and the empty cells that would complete a line, all updated
+    # incrementally by place() and remove(). Index 0 is X, 1 is O.
+    __slots__ = ("x", "o", "geometry", "counts", "won", "threats", "threat_counts")
+
+    def __init__(self, x=0, o=0, geometry=CLASSIC):
+        self.x = 0
+        self.o = 0
+        self.geometry = geometry
+        self.reset_lines()
+        for symbol, mask in (("X", x), ("O", o)):
+            while mask:
+                low = mask & -mask
+                self.place(low.bit_length() - 1, symbol)
+                mask ^= low
+
+    def reset_lines(self):
+        lines = len(self.geometry.win_masks)
+        cells = self.geometry.cells
+        self.counts = ([0] * lines, [0] * lines)
+        self.won = [0, 0]
+        self.threats = [0, 0]
+        self.threat_counts = ([0] * cells, [0] * cells)
+
+    @classmethod
+    def from_list(cls, cells, geometry=None):
+        if geometry is None:
+            geometry = geometry_for(int(round(len(cells) ** 0.5)))
+        board = cls(geometry=geometry)
+        for i, symbol in enumerate(cells):
+            if symbol:
+                board.place(i, symbol)
+        return board
+
+    def to_list(self):
+        return [self[i] for i in range(self.geometry.cells)]
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.x = self.x
+        board.o = self.o
+        board.geometry = self.geometry
+        board.counts = (self.counts[0][:], self.counts[1][:])
+        board.won = self.won[:]
+        board.threats = self.threats[:]
+        board.threat_counts = (self.threat_counts[0][:], self.threat_counts[1][:])
+        return board
+
+    def __getitem__(self, index):
+        b = 1 << index
+        if self.x & b:
+            return "X"
+        if self.o & b:
+            return "O"
+        return ""
+
+    def __len__(self):
+        return self.geometry.cells
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and self.x == other.x and self.o == other.o
+                and self.geometry == other.geometry)
+
+    def __hash__(self):
+        return hash((self.x, self.o, self.geometry))
+
+    def __repr__(self):
+        return f"Board({''.join(self[i] or '.' for i in range(self.geometry.cells))})"
+
+    @property
+    def occupied(self):
+        return self.x | self.o
+
+    def mask(self, symbol):
+        return self.x if symbol == "X" else self.o
+
+    def empty(self):
+        return self.geometry.empty_cells(self.x | self.o)
+
+    def is_empty(self, index):
+        return not (self.x | self.o) >> index & 1
+
+    def is_legal(self, index):
+        return self.is_empty(index)
+
+    def place(self, index, symbol):
+        if symbol == "X":
+            self.x |= 1 << index
+            self.update_lines(index, 0, 1)
+        else:
+            self.o |= 1 << index
+            self.update_lines(index, 1, 1)
+
+    def remove(self, index):
+        bit = 1 << index
+        if self.x & bit:
+            self.x &= ~bit
+            self.update_lines(index, 0, -1)
+        elif self.o & bit:
+            self.o &= ~bit
+            self.update_lines(index, 1, -1)
+
+    def update_lines(self, index, player, delta):
+        geometry = self.geometry
+        full = geometry.win_length
+        own = self.counts[player]
+        other = self.counts[1 - player]
+        after = self.x | self.o
+        before = after ^ 1 << index
+        for line in geometry.line_ids_through[index]:
+            mask = geometry.win_masks[line]
+            own_before = own[line]
+            own_after = own[line] = own_before + delta
+            if own_after == full:
+                self.won[player] |= 1 << line
+            elif own_before == full:
+                self.won[player] &= ~(1 << line)
+
+            if other[line] == 0:
+                if own_before == full - 1:
+                    self.drop_threat(player, mask & ~before)
+                if own_after == full - 1:
+                    self.add_threat(player, mask & ~after)
+            elif other[line] == full - 1:
+                if own_before == 0:
+                    self.drop_threat(1 - player, mask & ~before)
+                if own_after == 0:
+                    self.add_threat(1 - player, mask & ~after)
+
+    def add_threat(self, player, bit):
+        counts = self.threat_counts[player]
+        cell = bit.bit_length() - 1
+        counts[cell] += 1
+        if counts[cell] == 1:
+            self.threats[player] |= bit
+
+    def drop_threat(self, player, bit):
+        counts = self.threat_counts[player]
+        cell = bit.bit_length() - 1
+        counts[cell] -= 1
+        if counts[cell] == 0:
+            self.threats[player] &= ~bit
+
+    def clear(self):
+        self.x = 0
+        self.o = 0
+        self.reset_lines()
+
+    def winner(self):
+        if self.won[0]:
+            return "X"
+        if self.won[1]:
+            return "O"
+        return None
+
+    def winning_line(self):
+        for won in self.won:
+            if won:
+                return self.geometry.win_lines[(won & -won).bit_length() - 1]
+        return None
+
+    def winning_cells(self):
+        for won in self.won:
+            if won:
+                cells = set()
+                while won:
+                    low = won & -won
+                    cells.update(self.geometry.win_lines[low.bit_length() - 1])
+                    won ^= low
+                return tuple(sorted(cells))
+        return ()
+
+    def threat_cells(self, symbol):
+        return self.threats[0 if symbol == "X" else 1]
+
+    def winning_move(self, symbol):
+        threats = self.threat_cells(symbol)
+        return (threats & -threats).bit_length() - 1 if threats else None
+
+    def has_double_threat(self, symbol):
+        threats = self.threat_cells(symbol)
+        return threats & (threats - 1) != 0
+
+    def is_full(self):
+        return self.x | self.o == self.geometry.full_mask
+
+    def is_over(self):
+        return self.winner() is not None or self.is_full()
+
+
+def winning_move(own, occupied, geometry=CLASSIC):
+    for i in range(geometry.cells):
+        b = 1 << i
+        if not occupied & b and geometry.is_win_through(own | b, i):
+            return i
+    return None
+
+
+def get_ai_move(board, difficulty, ai="O", player="X", rng=random, time_budget=DEFAULT_TIME_BUDGET,
+                searchers=None, stop=None):
+    return choose_ai_move(board, difficulty, ai, player, rng, time_budget, searchers, stop)[0]
+
+
+def owned_searcher(searchers, kind, geometry, factory, time_budget):
+    key = (kind, geometry)
+    searcher = searchers.get(key)
+    if searcher is None:
+        searcher = searchers[key] = factory(geometry)
+    searcher.time_budget = time_budget
+    return searcher
+
+
+def choose_ai_move(board, difficulty, ai="O", player="X", rng=random, time_budget=DEFAULT_TIME_BUDGET,
+                   searchers=None, stop=None):
+    # searchers: a dict of searcher instances owned by the caller, used instead of the shared module
+    # ones so that searches on different threads never share a tree. stop: a threading.Event that
+    # ends a running search early.
+    if not isinstance(board, Board):
+        # Other rule sets, such as ultimate.UltimateBoard, bring their own policies.
+        return board.choose_ai_move(difficulty, ai, player, rng, time_budget, stop)
+    geometry = board.geometry
+    empty = board.empty()
+
+    if difficulty == "Easy":
+        return rng.choice(empty), "random", None
+
+    if difficulty == "Adaptive":
+        import learned
+        move = learned.lookup_move(geometry, board.mask(ai), board.mask(player), rng)
+        if move is not None:
+            return move, "learned", None
+        # Untrained, or a board the table does not cover.
+        difficulty = "Medium"
+
+    if difficulty in ("Medium", "Hard"):
+        move = board.winning_move(ai)
+        if move is not None:
+            return move, "win", None
+        move = board.winning_move(player)
+        if move is not None:
+            return move, "block", None
+
+        if difficulty == "Hard" and empty:
+            occupied = board.occupied
+            for pos in geometry.preferred:
+                if not occupied >> pos & 1:
+                    return pos, "preferred", None
+
+        return rng.choice(empty), "random", None
+
+    if difficulty == "MCTS":
+        import mcts
+        if searchers is None:
+            searcher = mcts.default_player(geometry, time_budget)
+        else:
+            searcher = owned_searcher(searchers, "mcts", geometry, mcts.MonteCarloSearch, time_budget)
+        searcher.stop = stop
+        return searcher.best_move(board, ai, player), "mcts", searcher
+
+    # search builds its symmetry tables on import, so it is only loaded when a table misses.
+    if geometry is not CLASSIC:
+        import tablebase
+        move = tablebase.lookup_move(geometry, board.mask(ai), board.mask(player))
+        if move is not None:
+            return move, "tablebase", None
+        import search
+        if searchers is None:
+            searcher = search.timed_search(geometry, time_budget)
+        else:
+            searcher = owned_searcher(searchers, "timed", geometry, search.IterativeDeepeningSearch, time_budget)
+        searcher.stop = stop
+        return searcher.best_move(board, ai, player), "iterative_deepening", searcher
+
+    import perfect_play
+    move = perfect_play.lookup_move(board.mask(ai), board.mask(player))
+    if move is not None:
+        return move, "table", None
+    import search
+    if searchers is None:
+        searcher = search.default_search()
+    else:
+        searcher = owned_searcher(searchers, "alpha_beta", geometry, lambda _: search.AlphaBetaSearch(), None)
+    return searcher.best_move(board, ai, player, rng), "alpha_beta", searcher
+
+
+def minimax_best_move(board, ai="O", player="X", rng=random):
+    ai_mask = board.mask(ai)
+    player_mask = board.mask(player)
+    occupied = ai_mask | player_mask
+    best_score = -float('inf')
+    best_move = None
+
+    for i in range(CELLS):
+        b = 1 << i
+        if not occupied & b:
+            score = minimax(ai_mask | b, player_mask, 0, False)
+            if score > best_score:
+                best_score = score
+                best_move = i
+    return best_move if best_move is not None else rng.choice(board.empty())
+
+
+def minimax(ai_mask, player_mask, depth, is_maximizing):
+    if WINS[ai_mask]:
+        return 10 - depth
+    if WINS[player_mask]:
+        return depth - 10
+    occupied = ai_mask | player_mask
+    if occupied == FULL_MASK:
+        return 0
+
+    if is_maximizing:
+        best_score = -float('inf')
+        for i in range(CELLS):
+            b = 1 << i
+            if not occupied & b:
+                score = minimax(ai_mask | b, player_mask, depth + 1, False)
+                if score > best_score:
+                    best_score = score
+        return best_score
+    else:
+        best_score = float('inf')
+        for i in range(CELLS):
+            b = 1 << i
+            if not occupied & b:
+                score = minimax(ai_mask, player_mask | b, depth + 1, True)
+                if score < best_score:
+                    best_score = score
+        return best_score
@@ -0,0 +1,228 @@
+import argparse
+import random
+import sys
+import time
+
+import engine
+
+
+class GameState:
+    # An immutable position: both players' bitmasks, the move that led here and the state it was
+    # played from. Lines of play share their common prefix, so keeping a whole game costs one small
+    # object per ply and every earlier position stays reachable through `parent`.
+    __slots__ = ("geometry", "x", "o", "move", "parent", "ply")
+
+    def __init__(self, geometry=engine.CLASSIC, x=0, o=0, move=None, parent=None, ply=None):
+        assign = object.__setattr__
+        assign(self, "geometry", geometry)
+        assign(self, "x", x)
+        assign(self, "o", o)
+        assign(self, "move", move)
+        assign(self, "parent", parent)
+        assign(self, "ply", bin(x | o).count("1") if ply is None else ply)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"GameState({self.geometry.name}, moves={self.moves()})"
+
+    @classmethod
+    def from_moves(cls, geometry, moves):
+        state = cls(geometry)
+        for move in moves:
+            state = state.play(move)
+        return state
+
+    @property
+    def turn(self):
+        return "X" if self.ply % 2 == 0 else "O"
+
+    @property
+    def occupied(self):
+        return self.x | self.o
+
+    def mask(self, symbol):
+        return self.x if symbol == "X" else self.o
+
+    def play(self, move):
+        # Only occupancy is checked here; rules such as Ultimate's forced board are the board's job.
+        bit = 1 << move
+        if (self.x | self.o) & bit:
+            raise ValueError(f"Cell {move} is already taken")
+        if self.ply % 2 == 0:
+            return GameState(self.geometry, self.x | bit, self.o, move, self, self.ply + 1)
+        return GameState(self.geometry, self.x, self.o | bit, move, self, self.ply + 1)
+
+    def line(self):
+        states = []
+        state = self
+        while state is not None:
+            states.append(state)
+            state = state.parent
+        states.reverse()
+        return states
+
+    def moves(self):
+        return [state.move for state in self.line()[1:]]
+
+    def board(self):
+        # A fresh mutable board for this position, so searches never touch a board anyone else holds.
+        if isinstance(self.geometry, engine.Geometry):
+            return engine.Board(self.x, self.o, self.geometry)
+        import ultimate
+        return ultimate.UltimateBoard.from_masks(self.x, self.o, self.move)
+
+
+class Timeline:
+    # The line of play on show, with O(1) undo, redo and jumps to any ply along it. Playing a move
+    # other than the next one in the line starts a new branch; the abandoned line's last state is
+    # kept in `branches` and can be switched back to.
+    __slots__ = ("line", "cursor", "branches")
+
+    def __init__(self, root):
+        self.line = [root]
+        self.cursor = 0
+        self.branches = []
+
+    @property
+    def current(self):
+        return self.line[self.cursor]
+
+    @property
+    def root(self):
+        return self.line[0]
+
+    @property
+    def tip(self):
+        return self.line[-1]
+
+    def play(self, move):
+        line = self.line
+        following = self.cursor + 1
+        if following < len(line):
+            if line[following].move == move:
+                self.cursor = following
+                return line[following]
+            # Replaying the move of a line that was left earlier goes back to that line, so its
+            # states, and anything keyed by them, are reused rather than duplicated.
+            branch = self.branch_through(line[self.cursor], move)
+            if branch is not None:
+                self.switch(branch)
+                return self.goto(following)
+            self.branches.append(line[-1])
+            del line[following:]
+        state = line[self.cursor].play(move)
+        line.append(state)
+        self.cursor = following
+        return state
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self.line) - 1
+
+    def goto(self, ply):
+        if not 0 <= ply < len(self.line):
+            raise ValueError(f"Ply {ply} is outside this line (0-{len(self.line) - 1})")
+        self.cursor = ply
+        return self.line[ply]
+
+    def undo(self, plies=1):
+        return self.goto(max(0, self.cursor - plies))
+
+    def redo(self, plies=1):
+        return self.goto(min(len(self.line) - 1, self.cursor + plies))
+
+    def undo_to(self, turn):
+        # Steps back to the latest earlier position with `turn` to move; None if there is none.
+        line = self.line
+        ply = self.cursor - 1
+        while ply >= 0 and line[ply].turn != turn:
+            ply -= 1
+        return self.goto(ply) if ply >= 0 else None
+
+    def redo_to(self, turn):
+        # Steps forward to the next position with `turn` to move, or to the end of the line.
+        line = self.line
+        ply = self.cursor + 1
+        while ply < len(line) - 1 and line[ply].turn != turn:
+            ply += 1
+        return self.goto(ply) if ply < len(line) else None
+
+    def branch_through(self, state, move):
+        # The stored branch whose line plays `move` from `state`, if there is one.
+        for branch in self.branches:
+            reached = branch
+            while reached.ply > state.ply + 1:
+                reached = reached.parent
+            if reached.parent is state and reached.move == move:
+                return branch
+        return None
+
+    def switch(self, branch):
+        # Makes a stored branch the line on show, at its last position.
+        self.branches.remove(branch)
+        self.branches.append(self.tip)
+        self.line = branch.line()
+        self.cursor = len(self.line) - 1
+        return branch
+
+    def states(self):
+        # The positions reached by the moves played so far, in order, up to the one on show.
+        return self.line[1:self.cursor + 1]
+
+    def moves(self):
+        return [state.move for state in self.states()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure game-state history memory and navigation speed.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    # Imported here so front ends that only keep a timeline do not pay for it at startup.
+    import tracemalloc
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    rng = random.Random(args.seed)
+    tracemalloc.start()
+    games = []
+    plies = 0
+    for _ in range(args.games):
+        board = engine.Board(geometry=geometry)
+        state = GameState(geometry)
+        while not board.is_over():
+            move = rng.choice(board.empty())
+            board.place(move, state.turn)
+            state = state.play(move)
+        games.append(state)
+        plies += state.ply
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    timeline = Timeline(games[-1].line()[0])
+    for move in games[-1].moves():
+        timeline.play(move)
+    steps = 100000
+    started = time.perf_counter()
+    for step in range(steps):
+        if step % 2:
+            timeline.redo()
+        else:
+            timeline.undo()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.games:,} games, {plies:,} plies kept: {memory / 1024:,.0f} KiB, {memory / plies:.0f} bytes per ply")
+    print(f"undo/redo: {elapsed / steps * 1e9:.0f} ns per step")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import array
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".tictactoe_history.sqlite3")
+
+ALL = "*"
+OUTCOMES = ("player", "ai", "draw")
+SECONDS_PER_DAY = 86400
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    difficulty TEXT NOT NULL,
+    board TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    moves BLOB NOT NULL,
+    ai_latency_ms BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_played_at ON games (played_at);
+CREATE INDEX IF NOT EXISTS games_difficulty_played_at ON games (difficulty, played_at);
+
+CREATE TABLE IF NOT EXISTS stats (
+    difficulty TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    player_wins INTEGER NOT NULL,
+    ai_wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL,
+    last_played_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS daily (
+    day INTEGER NOT NULL,
+    difficulty TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    player_wins INTEGER NOT NULL,
+    ai_wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    PRIMARY KEY (day, difficulty)
+);
+"""
+
+# streak counts consecutive player wins (positive) or AI wins (negative); a draw resets it.
+UPDATE_STATS = """
+INSERT INTO stats (difficulty, games, player_wins, ai_wins, draws, streak, best_streak, last_played_at)
+VALUES (:difficulty, 1, :player_wins, :ai_wins, :draws, :player_wins - :ai_wins, :player_wins, :played_at)
+ON CONFLICT (difficulty) DO UPDATE SET
+    games = games + 1,
+    player_wins = player_wins + excluded.player_wins,
+    ai_wins = ai_wins + excluded.ai_wins,
+    draws = draws + excluded.draws,
+    streak = CASE
+        WHEN excluded.player_wins THEN MAX(streak, 0) + 1
+        WHEN excluded.ai_wins THEN MIN(streak, 0) - 1
+        ELSE 0 END,
+    best_streak = CASE
+        WHEN excluded.player_wins THEN MAX(best_streak, MAX(streak, 0) + 1)
+        ELSE best_streak END,
+    last_played_at = MAX(last_played_at, excluded.last_played_at)
+"""
+
+UPDATE_DAILY = """
+INSERT INTO daily (day, difficulty, games, player_wins, ai_wins, draws)
+VALUES (:day, :difficulty, 1, :player_wins, :ai_wins, :draws)
+ON CONFLICT (day, difficulty) DO UPDATE SET
+    games = games + 1,
+    player_wins = player_wins + excluded.player_wins,
+    ai_wins = ai_wins + excluded.ai_wins,
+    draws = draws + excluded.draws
+"""
+
+
+class GameRecord:
+    __slots__ = ("played_at", "difficulty", "board", "outcome", "moves", "ai_latency_ms")
+
+    def __init__(self, difficulty, board, outcome, moves, ai_latency_ms=(), played_at=None):
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown outcome: {outcome}")
+        self.played_at = time.time() if played_at is None else played_at
+        self.difficulty = difficulty
+        self.board = board
+        self.outcome = outcome
+        self.moves = bytes(moves)
+        self.ai_latency_ms = array.array("f", ai_latency_ms).tobytes()
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def insert_games(conn, records):
+    games = []
+    aggregates = []
+    for record in records:
+        games.append((record.played_at, record.difficulty, record.board, record.outcome,
+                      record.moves, record.ai_latency_ms))
+        counts = {
+            "played_at": record.played_at,
+            "day": int(record.played_at // SECONDS_PER_DAY),
+            "player_wins": int(record.outcome == "player"),
+            "ai_wins": int(record.outcome == "ai"),
+            "draws": int(record.outcome == "draw")
+        }
+        aggregates.append(dict(counts, difficulty=record.difficulty))
+        aggregates.append(dict(counts, difficulty=ALL))
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO games (played_at, difficulty, board, outcome, moves, ai_latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            games
+        )
+        conn.executemany(UPDATE_STATS, aggregates)
+        conn.executemany(UPDATE_DAILY, aggregates)
+
+
+def win_rate(player_wins, games):
+    return player_wins / games * 100 if games else 0.0
+
+
+_STOP = object()
+
+
+class HistoryStore:
+    def __init__(self, path=DEFAULT_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.reader = None
+        self.error = None
+        connect(path).close()
+        self.writer = threading.Thread(target=self.run_writer, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def record_game(self, record):
+        # Queued before an earlier failure is raised, so that failure never costs this game too.
+        self.queue.put(record)
+        self.raise_error()
+
+    def raise_error(self):
+        # A failed write is reported once, to whichever call comes next, instead of being lost with
+        # the writer thread.
+        error = self.error
+        if error is not None:
+            self.error = None
+            raise error
+
+    def run_writer(self):
+        conn = connect(self.path)
+        running = True
+        while running:
+            item = self.queue.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    insert_games(conn, batch)
+                except sqlite3.Error as exc:
+                    self.error = exc
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def flush(self, timeout=None):
+        done = threading.Event()
+        self.queue.put(done)
+        flushed = done.wait(timeout)
+        self.raise_error()
+        return flushed
+
+    def close(self, timeout=5):
+        self.queue.put(_STOP)
+        self.writer.join(timeout)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        self.raise_error()
+
+    def read(self, sql, params=()):
+        if self.reader is None:
+            self.reader = connect(self.path)
+        return self.reader.execute(sql, params).fetchone()
+
+    def summary(self, difficulty=ALL):
+        row = self.read(
+            "SELECT games, player_wins, ai_wins, draws, streak, best_streak FROM stats WHERE difficulty = ?",
+            (difficulty,)
+        )
+        games, player_wins, ai_wins, draws, streak, best_streak = row or (0, 0, 0, 0, 0, 0)
+        return {
+            "games": games,
+            "player_wins": player_wins,
+            "ai_wins": ai_wins,
+            "draws": draws,
+            "win_rate": win_rate(player_wins, games),
+            "streak": streak,
+            "best_streak": best_streak
+        }
+
+    def window(self, days, difficulty=ALL, now=None):
+        now = time.time() if now is None else now
+        first_day = int(now // SECONDS_PER_DAY) - days + 1
+        row = self.read(
+            "SELECT COALESCE(SUM(games), 0), COALESCE(SUM(player_wins), 0), "
+            "COALESCE(SUM(ai_wins), 0), COALESCE(SUM(draws), 0) "
+            "FROM daily WHERE difficulty = ? AND day >= ?",
+            (difficulty, first_day)
+        )
+        games, player_wins, ai_wins, draws = row
+        return {
+            "games": games,
+            "player_wins": player_wins,
+            "ai_wins": ai_wins,
+            "draws": draws,
+            "win_rate": win_rate(player_wins, games)
+        }
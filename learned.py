@@ -0,0 +1,93 @@
+import os
+import random
+import struct
+
+import engine
+from perfect_play import POSITIONS, TERNARY
+
+MAGIC = b"TTTL"
+VERSION = 1
+HEADER = struct.Struct("<4sBxxxQI")
+# Values are stored as signed bytes: +SCALE is a certain win for the player to move, -SCALE a loss.
+SCALE = 127
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "learned_policy.bin")
+
+
+def pack(values, episodes):
+    return HEADER.pack(MAGIC, VERSION, episodes, POSITIONS) + bytes(values)
+
+
+def save(path, values, episodes):
+    data = pack(values, episodes)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class LearnedPolicy:
+    def __init__(self, data, source=None):
+        magic, version, episodes, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or count != POSITIONS:
+            raise ValueError(f"Incompatible learned policy: {source or 'buffer'}")
+        if len(data) != HEADER.size + POSITIONS:
+            raise ValueError(f"Truncated learned policy: {source or 'buffer'}")
+        self.values = memoryview(data)[HEADER.size:].cast("b")
+        self.episodes = episodes
+        self.source = source
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            return cls(f.read(), path)
+
+    def value(self, mover_mask, opponent_mask):
+        return self.values[TERNARY[mover_mask] + 2 * TERNARY[opponent_mask]]
+
+    def best_move(self, mover_mask, opponent_mask, rng=random):
+        # Greedy on the learned afterstate values; wins are taken at once, ties broken at random.
+        occupied = mover_mask | opponent_mask
+        values = self.values
+        opponent_index = TERNARY[opponent_mask]
+        best_score = None
+        best_moves = []
+        for i in range(engine.CELLS):
+            b = 1 << i
+            if occupied & b:
+                continue
+            if engine.WINS[mover_mask | b]:
+                return i
+            score = -values[opponent_index + 2 * TERNARY[mover_mask | b]]
+            if best_score is None or score > best_score:
+                best_score = score
+                best_moves = [i]
+            elif score == best_score:
+                best_moves.append(i)
+        return rng.choice(best_moves) if best_moves else None
+
+
+_policy = None
+_policy_path = None
+
+
+def load(path=DEFAULT_PATH):
+    # A missing or unreadable file is remembered too (as None), so an untrained Adaptive does not
+    # go back to the filesystem on every move.
+    global _policy, _policy_path
+    if _policy_path != path:
+        try:
+            _policy = LearnedPolicy.open(path)
+        except (OSError, ValueError, struct.error):
+            _policy = None
+        _policy_path = path
+    return _policy
+
+
+def lookup_move(geometry, mover_mask, opponent_mask, rng=random):
+    if geometry is not engine.CLASSIC:
+        return None
+    policy = load()
+    if policy is None:
+        return None
+    return policy.best_move(mover_mask, opponent_mask, rng)
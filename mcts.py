@@ -0,0 +1,286 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+EXPLORATION = 1.4
+MAX_WORKERS = os.cpu_count() or 1
+
+
+class Node:
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins", "terminal")
+
+    def __init__(self, move, parent, untried, terminal=False):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        # From the point of view of the player who made `move`.
+        self.wins = 0.0
+        self.terminal = terminal
+
+
+class MonteCarloSearch:
+    def __init__(self, geometry, time_budget=engine.DEFAULT_TIME_BUDGET, iterations=None,
+                 exploration=EXPLORATION, rng=None):
+        self.geometry = geometry
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.exploration = exploration
+        self.rng = rng or random.Random()
+        self.root = None
+        self.root_state = None
+        self.stop = None
+        self.nodes = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+
+    def new_root(self, mover, opponent):
+        untried = self.geometry.empty_cells(mover | opponent)
+        self.rng.shuffle(untried)
+        return Node(None, None, untried)
+
+    def advance(self, mover, opponent):
+        # Reuse the subtree for this position if it was reached from the last root.
+        root = self.root
+        if root is not None:
+            if self.root_state == (mover, opponent):
+                return root
+            root_mover, root_opponent = self.root_state
+            for child in root.children:
+                if root_mover | 1 << child.move != mover:
+                    continue
+                for grandchild in child.children:
+                    if root_opponent | 1 << grandchild.move == opponent:
+                        grandchild.parent = None
+                        return grandchild
+        return self.new_root(mover, opponent)
+
+    def search(self, mover, opponent, time_budget=None, iterations=None):
+        self.root = self.advance(mover, opponent)
+        self.root_state = (mover, opponent)
+        self.cache_hits = self.root.visits
+        self.nodes = 0
+        self.max_depth = 0
+
+        time_budget = self.time_budget if time_budget is None else time_budget
+        iterations = self.iterations if iterations is None else iterations
+        deadline = time.perf_counter() + time_budget
+        stop = self.stop
+        while True:
+            if iterations is not None:
+                if self.nodes >= iterations:
+                    break
+            elif self.nodes & 63 == 0 and (time.perf_counter() >= deadline or stop is not None and stop.is_set()):
+                break
+            self.iterate(mover, opponent)
+            self.nodes += 1
+        return {child.move: child.visits for child in self.root.children}
+
+    def iterate(self, mover, opponent):
+        geometry = self.geometry
+        node = self.root
+        depth = 0
+
+        while not node.untried and node.children:
+            log_visits = self.exploration * math.sqrt(math.log(node.visits))
+            best_score = -1.0
+            for child in node.children:
+                score = child.wins / child.visits + log_visits / math.sqrt(child.visits)
+                if score > best_score:
+                    best_score = score
+                    node = child
+            mover, opponent = opponent, mover | 1 << node.move
+            depth += 1
+
+        if node.untried and not node.terminal:
+            move = node.untried.pop()
+            mover, opponent = opponent, mover | 1 << move
+            occupied = mover | opponent
+            terminal = geometry.is_win_through(opponent, move) or occupied == geometry.full_mask
+            untried = [] if terminal else geometry.empty_cells(occupied)
+            self.rng.shuffle(untried)
+            child = Node(move, node, untried, terminal)
+            node.children.append(child)
+            node = child
+            depth += 1
+
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        if node.move is None:
+            result = 0.5
+        else:
+            result = self.rollout(mover, opponent, node.move)
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            result = 1.0 - result
+            node = node.parent
+
+    def rollout(self, mover, opponent, last_move):
+        # Returns 1 if the player who made `last_move` wins, 0.5 for a draw, 0 for a loss.
+        geometry = self.geometry
+        if geometry.is_win_through(opponent, last_move):
+            return 1.0
+        cells = geometry.empty_cells(mover | opponent)
+        self.rng.shuffle(cells)
+        result = 0.0
+        for cell in cells:
+            mover |= 1 << cell
+            if geometry.is_win_through(mover, cell):
+                return result
+            mover, opponent = opponent, mover
+            result = 1.0 - result
+        return 0.5
+
+    def best_move(self, board, ai="O", player="X"):
+        move = board.winning_move(ai)
+        if move is None:
+            move = board.winning_move(player)
+        if move is not None:
+            self.nodes = self.cache_hits = self.max_depth = 0
+            return move
+        return choose(parallel_search(self, board.mask(ai), board.mask(player)))
+
+
+def choose(visits):
+    # None when the search was stopped before its first playout.
+    if not visits:
+        return None
+    return max(sorted(visits), key=visits.get)
+
+
+_players = {}
+
+
+def default_player(geometry, time_budget=engine.DEFAULT_TIME_BUDGET):
+    player = _players.get(geometry)
+    if player is None:
+        player = _players[geometry] = MonteCarloSearch(geometry)
+    player.time_budget = time_budget
+    player.iterations = None
+    return player
+
+
+class SharedStop:
+    # The stop flag of one parallel search, as seen from a pool process: every search id up to the
+    # shared `cancelled` value has been cancelled. Ids only grow, so there is nothing to reset.
+    __slots__ = ("cancelled", "search_id")
+
+    def __init__(self, cancelled, search_id):
+        self.cancelled = cancelled
+        self.search_id = search_id
+
+    def is_set(self):
+        return self.cancelled.value >= self.search_id
+
+
+_cancelled = None
+
+
+def init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+
+
+def search_position(geometry, mover, opponent, time_budget, iterations, seed, search_id=0):
+    player = default_player(geometry, time_budget)
+    player.rng.seed(seed)
+    player.stop = None if _cancelled is None else SharedStop(_cancelled, search_id)
+    visits = player.search(mover, opponent, time_budget, iterations)
+    return visits, player.nodes
+
+
+_pool = None
+_pool_workers = 0
+_pool_cancelled = None
+_search_ids = itertools.count(1)
+
+
+def worker_pool(workers):
+    global _pool, _pool_workers, _pool_cancelled
+    if _pool is None or _pool_workers < workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        # Handed to each process as it starts, so a cancelled search can stop trees already running.
+        _pool_cancelled = multiprocessing.RawValue("q", 0)
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(_pool_cancelled,))
+        _pool_workers = workers
+    return _pool
+
+
+def parallel_search(searcher, mover, opponent, workers=None):
+    # Root parallelization: independent trees from the same position, visit counts summed.
+    if workers is None:
+        workers = MAX_WORKERS if multiprocessing.parent_process() is None else 1
+    iterations = searcher.iterations
+    if iterations is not None and workers > 1:
+        iterations = -(-iterations // workers)
+    futures = []
+    search_id = next(_search_ids)
+    if workers > 1:
+        pool = worker_pool(workers - 1)
+        futures = [
+            pool.submit(search_position, searcher.geometry, mover, opponent, searcher.time_budget,
+                        iterations, searcher.rng.getrandbits(32), search_id)
+            for _ in range(workers - 1)
+        ]
+
+    visits = searcher.search(mover, opponent, searcher.time_budget, iterations)
+    if searcher.stop is not None and searcher.stop.is_set():
+        # Cancelled: running worker trees see the shared flag within 64 playouts, so nobody waits
+        # for them and the pool is free for the next search.
+        if futures:
+            _pool_cancelled.value = search_id
+        for future in futures:
+            future.cancel()
+        return visits
+    for future in futures:
+        worker_visits, playouts = future.result()
+        searcher.nodes += playouts
+        for move, count in worker_visits.items():
+            visits[move] = visits.get(move, 0) + count
+    return visits
+
+
+def benchmark(geometry, workers, seconds, seed):
+    searcher = default_player(geometry, seconds)
+    searcher.rng.seed(seed)
+    board = engine.Board(geometry=geometry)
+    parallel_search(searcher, board.x, board.o, workers)
+    return searcher.nodes / seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MCTS playouts and parallel scaling.")
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--win-length", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    benchmark(geometry, args.max_workers, 0.2, args.seed)
+    print(f"MCTS from the empty {geometry.name} board, {args.seconds:g} s per run, "
+          f"{os.cpu_count()} CPUs")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = benchmark(geometry, workers, args.seconds, args.seed)
+        baseline = baseline or rate
+        print(f"{workers:>2} workers {rate:>12,.0f} playouts/s {rate / workers:>12,.0f} per core "
+              f"efficiency {rate / (workers * baseline):6.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import engine
+
+MAGIC = b"TTTP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+POSITIONS = 3 ** engine.CELLS
+NO_ENTRY = 0xFFFF
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfect_play.bin")
+
+# Ternary weight of every 9-bit mask, so a position indexes as mover + 2 * opponent.
+TERNARY = tuple(
+    sum(3 ** i for i in range(engine.CELLS) if mask >> i & 1)
+    for mask in range(engine.FULL_MASK + 1)
+)
+
+
+def position_index(mover_mask, opponent_mask):
+    return TERNARY[mover_mask] + 2 * TERNARY[opponent_mask]
+
+
+def child_score(value):
+    if value > 0:
+        return 1 - value
+    if value < 0:
+        return -value - 1
+    return 0
+
+
+def solve():
+    moves = [NO_ENTRY] * POSITIONS
+    values = [0] * POSITIONS
+
+    def visit(mover, opponent):
+        index = position_index(mover, opponent)
+        if moves[index] != NO_ENTRY:
+            return values[index]
+
+        occupied = mover | opponent
+        best_value = -128
+        best_mask = 0
+        if not (engine.WINS[mover] or engine.WINS[opponent] or occupied == engine.FULL_MASK):
+            for i in range(engine.CELLS):
+                b = 1 << i
+                if occupied & b:
+                    continue
+                if engine.WINS[mover | b]:
+                    score = 10
+                elif occupied | b == engine.FULL_MASK:
+                    score = 0
+                else:
+                    score = child_score(visit(opponent, mover | b))
+                if score > best_value:
+                    best_value = score
+                    best_mask = b
+                elif score == best_value:
+                    best_mask |= b
+        else:
+            best_value = 0
+
+        moves[index] = best_mask
+        values[index] = best_value
+        return best_value
+
+    visit(0, 0)
+    return moves, values
+
+
+def pack(moves, values):
+    data = bytearray(HEADER.pack(MAGIC, VERSION, engine.CELLS, POSITIONS))
+    data += struct.pack(f"<{POSITIONS}H", *moves)
+    data += struct.pack(f"<{POSITIONS}b", *values)
+    return bytes(data)
+
+
+def save(path, moves, values):
+    data = pack(moves, values)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class PerfectPlayTable:
+    def __init__(self, buffer, source=None):
+        magic, version, cells, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or cells != engine.CELLS or count != POSITIONS:
+            raise ValueError(f"Incompatible perfect-play table: {source or 'buffer'}")
+        if len(buffer) != HEADER.size + 3 * POSITIONS:
+            raise ValueError(f"Truncated perfect-play table: {source or 'buffer'}")
+        self.buffer = buffer
+        self.source = source
+        self.moves_offset = HEADER.size
+        self.values_offset = HEADER.size + 2 * POSITIONS
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    @classmethod
+    def from_solution(cls, moves, values):
+        return cls(pack(moves, values))
+
+    def best_moves(self, mover_mask, opponent_mask):
+        index = position_index(mover_mask, opponent_mask)
+        offset = self.moves_offset + 2 * index
+        return self.buffer[offset] | self.buffer[offset + 1] << 8
+
+    def value(self, mover_mask, opponent_mask):
+        index = position_index(mover_mask, opponent_mask)
+        value = self.buffer[self.values_offset + index]
+        return value - 256 if value > 127 else value
+
+    def best_move(self, mover_mask, opponent_mask):
+        mask = self.best_moves(mover_mask, opponent_mask)
+        if mask == NO_ENTRY or mask == 0:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+
+_table = None
+
+
+def load(path=DEFAULT_PATH):
+    global _table
+    if _table is None:
+        try:
+            _table = PerfectPlayTable.open(path)
+        except (OSError, ValueError, struct.error):
+            moves, values = solve()
+            try:
+                save(path, moves, values)
+                _table = PerfectPlayTable.open(path)
+            except OSError:
+                _table = PerfectPlayTable.from_solution(moves, values)
+    return _table
+
+
+def lookup_move(mover_mask, opponent_mask):
+    return load().best_move(mover_mask, opponent_mask)
+
+
+def verify(table):
+    checked = 0
+    mismatches = []
+    for index in range(POSITIONS):
+        mover, opponent = decode(index)
+        mask = table.best_moves(mover, opponent)
+        if mask == NO_ENTRY:
+            continue
+        occupied = mover | opponent
+        if engine.WINS[mover] or engine.WINS[opponent] or occupied == engine.FULL_MASK:
+            continue
+
+        scores = {}
+        for i in range(engine.CELLS):
+            b = 1 << i
+            if not occupied & b:
+                scores[i] = engine.minimax(mover | b, opponent, 0, False)
+        best = max(scores.values())
+        expected = sum(1 << i for i, score in scores.items() if score == best)
+        if mask != expected or table.value(mover, opponent) != best:
+            mismatches.append((mover, opponent))
+        checked += 1
+    return checked, mismatches
+
+
+def decode(index):
+    mover = opponent = 0
+    for i in range(engine.CELLS):
+        index, digit = divmod(index, 3)
+        if digit == 1:
+            mover |= 1 << i
+        elif digit == 2:
+            opponent |= 1 << i
+    return mover, opponent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the Expert perfect-play table.")
+    parser.add_argument("command", choices=["regenerate", "verify"])
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "regenerate":
+        moves, values = solve()
+        save(args.path, moves, values)
+        solved = sum(1 for mask in moves if mask not in (NO_ENTRY, 0))
+        print(f"Wrote {solved} solved positions to {args.path}")
+        return 0
+
+    table = PerfectPlayTable.open(args.path)
+    checked, mismatches = verify(table)
+    print(f"Checked {checked} positions against minimax: {len(mismatches)} mismatches")
+    for mover, opponent in mismatches[:10]:
+        print(f"  mover={mover:09b} opponent={opponent:09b}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+import engine
+
+MAGIC = b"TTTG"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sBxxx")
+RECORD_HEADER = struct.Struct("<BBBBB")
+
+OUTCOME_CODES = {None: 0, "X": 1, "O": 2}
+OUTCOMES = {code: outcome for outcome, code in OUTCOME_CODES.items()}
+UNKNOWN_DIFFICULTY = 255
+
+# Boards of up to 16 cells store two moves per byte.
+NIBBLE_CELLS = 16
+
+
+class RecordedGame:
+    __slots__ = ("size", "win_length", "difficulty", "winner", "moves")
+
+    def __init__(self, size, win_length, difficulty, winner, moves):
+        self.size = size
+        self.win_length = win_length
+        self.difficulty = difficulty
+        self.winner = winner
+        self.moves = tuple(moves)
+
+    def __eq__(self, other):
+        return isinstance(other, RecordedGame) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"RecordedGame({self.size}x{self.size}/{self.win_length}, {self.difficulty}, "
+                f"winner={self.winner}, moves={list(self.moves)})")
+
+    @property
+    def geometry(self):
+        return engine.geometry_for(self.size, self.win_length)
+
+    @classmethod
+    def from_moves(cls, geometry, difficulty, moves):
+        board = engine.Board(geometry=geometry)
+        for index, symbol in zip(moves, _symbols()):
+            board.place(index, symbol)
+        return cls(geometry.size, geometry.win_length, difficulty, board.winner(), moves)
+
+    def replay(self):
+        board = engine.Board(geometry=self.geometry)
+        for index, symbol in zip(self.moves, _symbols()):
+            if not board.is_empty(index):
+                raise ValueError(f"Cell {index} played twice in {self!r}")
+            board.place(index, symbol)
+            yield index, symbol, board
+
+    def final_board(self):
+        board = engine.Board(geometry=self.geometry)
+        for _, _, board in self.replay():
+            pass
+        return board
+
+
+def _symbols():
+    while True:
+        yield "X"
+        yield "O"
+
+
+def encode(game):
+    cells = game.size * game.size
+    difficulty = (engine.DIFFICULTIES.index(game.difficulty)
+                  if game.difficulty in engine.DIFFICULTIES else UNKNOWN_DIFFICULTY)
+    header = RECORD_HEADER.pack(game.size, game.win_length, difficulty,
+                                OUTCOME_CODES[game.winner], len(game.moves))
+    moves = game.moves
+    if cells <= NIBBLE_CELLS:
+        packed = bytearray((len(moves) + 1) // 2)
+        for i, move in enumerate(moves):
+            packed[i >> 1] |= move << (4 * (i & 1))
+        return header + bytes(packed)
+    return header + bytes(moves)
+
+
+def decode(buffer, offset):
+    # Lengths are checked before anything is unpacked, so a cut-off file is always a ValueError.
+    start = offset
+    if len(buffer) - offset < RECORD_HEADER.size:
+        raise ValueError(f"Truncated game record at offset {start}")
+    size, win_length, difficulty, outcome, count = RECORD_HEADER.unpack_from(buffer, offset)
+    offset += RECORD_HEADER.size
+    nibbles = size * size <= NIBBLE_CELLS
+    length = (count + 1) // 2 if nibbles else count
+    if len(buffer) - offset < length:
+        raise ValueError(f"Truncated game record at offset {start}")
+    if outcome not in OUTCOMES:
+        raise ValueError(f"Corrupt game record at offset {start}: outcome {outcome}")
+    if nibbles:
+        data = buffer[offset:offset + length]
+        moves = [(data[i >> 1] >> (4 * (i & 1))) & 0xF for i in range(count)]
+    else:
+        moves = list(buffer[offset:offset + length])
+    name = engine.DIFFICULTIES[difficulty] if difficulty < len(engine.DIFFICULTIES) else None
+    return RecordedGame(size, win_length, name, OUTCOMES[outcome], moves), offset + length
+
+
+class RecordWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, "rb") as f:
+                _check_header(f.read(FILE_HEADER.size), path)
+
+    def write(self, game):
+        self.file.write(encode(game))
+
+    def write_moves(self, geometry, difficulty, moves):
+        self.write(RecordedGame.from_moves(geometry, difficulty, moves))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(data, path):
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"Not a game record file: {path}")
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported game record file: {path}")
+
+
+class RecordReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.buffer = b""
+        else:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self.buffer[:FILE_HEADER.size], path)
+
+    def __iter__(self):
+        buffer = self.buffer
+        offset = FILE_HEADER.size
+        end = len(buffer)
+        while offset < end:
+            game, offset = decode(buffer, offset)
+            yield game
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_games(path):
+    with RecordReader(path) as reader:
+        yield from reader
+
+
+def self_play(path, games, first, second, geometry, seed, time_budget=engine.DEFAULT_TIME_BUDGET):
+    import tournament
+
+    rng = random.Random(seed)
+    with RecordWriter(path) as writer:
+        for _ in range(games):
+            moves = []
+            tournament.play_game(first, second, geometry, rng, time_budget, moves)
+            writer.write_moves(geometry, second, moves)
+
+
+def summarize(path):
+    counts = {"X": 0, "O": 0, None: 0}
+    mismatches = 0
+    for game in read_games(path):
+        if game.final_board().winner() != game.winner:
+            mismatches += 1
+        counts[game.winner] += 1
+    return counts, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write or read compact binary game records.")
+    parser.add_argument("command", choices=["selfplay", "stats"])
+    parser.add_argument("path")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--first", choices=engine.DIFFICULTIES, default="Hard")
+    parser.add_argument("--second", choices=engine.DIFFICULTIES, default="Hard")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--time-budget", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "selfplay":
+        geometry = engine.geometry_for(args.size, args.win_length)
+        started = time.perf_counter()
+        self_play(args.path, args.games, args.first, args.second, geometry, args.seed, args.time_budget)
+        elapsed = time.perf_counter() - started
+        print(f"Appended {args.games} games to {args.path} ({args.games / elapsed:,.0f} games/s)")
+        return 0
+
+    started = time.perf_counter()
+    counts, mismatches = summarize(args.path)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    size = os.path.getsize(args.path)
+    print(f"{total} games, {size} bytes ({size / total if total else 0:.1f} bytes/game)")
+    print(f"X wins {counts['X']} | O wins {counts['O']} | draws {counts[None]}")
+    print(f"Replayed {total / elapsed if elapsed else 0:,.0f} games/s, {mismatches} outcome mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,460 @@
+import random
+import sys
+import time
+from collections import OrderedDict
+
+import engine
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+INF = float('inf')
+
+
+def _transform(cell, rotation, mirror):
+    row, col = divmod(cell, engine.SIZE)
+    if mirror:
+        col = engine.SIZE - 1 - col
+    for _ in range(rotation):
+        row, col = col, engine.SIZE - 1 - row
+    return row * engine.SIZE + col
+
+
+# Cell permutations for the 8 symmetries of the square, identity first.
+SYMMETRIES = tuple(
+    tuple(_transform(cell, rotation, mirror) for cell in range(engine.CELLS))
+    for mirror in (False, True)
+    for rotation in range(4)
+)
+
+SYMMETRY_MASKS = tuple(
+    tuple(
+        sum(1 << perm[i] for i in range(engine.CELLS) if mask >> i & 1)
+        for mask in range(engine.FULL_MASK + 1)
+    )
+    for perm in SYMMETRIES
+)
+
+
+def canonical_key(first_mask, second_mask):
+    return min(table[first_mask] << engine.CELLS | table[second_mask] for table in SYMMETRY_MASKS)
+
+
+def _to_relative(score, depth):
+    if score > 0:
+        return score + depth
+    if score < 0:
+        return score - depth
+    return score
+
+
+def _from_relative(score, depth):
+    if score > 0:
+        return score - depth
+    if score < 0:
+        return score + depth
+    return score
+
+
+class AlphaBetaSearch:
+    def __init__(self, max_entries=50000, move_order=engine.PREFERRED):
+        self.max_entries = max_entries
+        self.move_order = tuple(1 << i for i in move_order)
+        self.table = OrderedDict()
+        self.nodes = 0
+        self.cache_hits = 0
+        self.evictions = 0
+        self.max_depth = 0
+
+    def reset_counters(self):
+        self.nodes = 0
+        self.cache_hits = 0
+        self.evictions = 0
+        self.max_depth = 0
+
+    def clear(self):
+        self.table.clear()
+        self.reset_counters()
+
+    def minimax(self, ai_mask, player_mask, depth, is_maximizing, alpha=-INF, beta=INF):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if engine.WINS[ai_mask]:
+            return 10 - depth
+        if engine.WINS[player_mask]:
+            return depth - 10
+        occupied = ai_mask | player_mask
+        if occupied == engine.FULL_MASK:
+            return 0
+
+        key = (canonical_key(ai_mask, player_mask), is_maximizing)
+        entry = self.table.get(key)
+        if entry is not None:
+            self.table.move_to_end(key)
+            flag, stored = entry
+            score = _from_relative(stored, depth)
+            if flag == EXACT:
+                self.cache_hits += 1
+                return score
+            if flag == LOWER and score > alpha:
+                alpha = score
+            elif flag == UPPER and score < beta:
+                beta = score
+            if alpha >= beta:
+                self.cache_hits += 1
+                return score
+
+        original_alpha = alpha
+        original_beta = beta
+        if is_maximizing:
+            best_score = -INF
+            for b in self.move_order:
+                if occupied & b:
+                    continue
+                score = self.minimax(ai_mask | b, player_mask, depth + 1, False, alpha, beta)
+                if score > best_score:
+                    best_score = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            break
+        else:
+            best_score = INF
+            for b in self.move_order:
+                if occupied & b:
+                    continue
+                score = self.minimax(ai_mask, player_mask | b, depth + 1, True, alpha, beta)
+                if score < best_score:
+                    best_score = score
+                    if score < beta:
+                        beta = score
+                        if alpha >= beta:
+                            break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.store(key, flag, _to_relative(best_score, depth))
+        return best_score
+
+    def store(self, key, flag, score):
+        table = self.table
+        table[key] = (flag, score)
+        table.move_to_end(key)
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+            self.evictions += 1
+
+    def best_move(self, board, ai="O", player="X", rng=random):
+        self.reset_counters()
+        ai_mask = board.mask(ai)
+        player_mask = board.mask(player)
+        occupied = ai_mask | player_mask
+        best_score = -INF
+        best_move = None
+
+        # Ties go to the lowest index, matching engine.minimax_best_move: a move
+        # below the current best only has to equal it, one above has to beat it.
+        for b in self.move_order:
+            if occupied & b:
+                continue
+            i = b.bit_length() - 1
+            if best_move is None:
+                alpha = -INF
+            elif i < best_move:
+                alpha = best_score - 1
+            else:
+                alpha = best_score
+            score = self.minimax(ai_mask | b, player_mask, 0, False, alpha, INF)
+            if score > alpha and (score > best_score or (score == best_score and i < best_move)):
+                best_score = score
+                best_move = i
+        return best_move if best_move is not None else rng.choice(board.empty())
+
+
+_default_search = None
+
+
+def default_search():
+    global _default_search
+    if _default_search is None:
+        _default_search = AlphaBetaSearch()
+    return _default_search
+
+
+def best_move(board, ai="O", player="X", rng=random):
+    return default_search().best_move(board, ai, player, rng)
+
+
+WIN_SCORE = 1000000
+
+# Horizon weights for a line holding only one side's pieces, indexed by piece count.
+LINE_WEIGHTS = (0, 1, 8, 64, 512, 4096, 32768)
+
+SAFETY_MARGIN = 0.05
+
+
+def _win_to_relative(score, ply):
+    if score >= WIN_SCORE - 1000:
+        return score + ply
+    if score <= 1000 - WIN_SCORE:
+        return score - ply
+    return score
+
+
+def _win_from_relative(score, ply):
+    if score >= WIN_SCORE - 1000:
+        return score - ply
+    if score <= 1000 - WIN_SCORE:
+        return score + ply
+    return score
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class IterativeDeepeningSearch:
+    def __init__(self, geometry, time_budget=engine.DEFAULT_TIME_BUDGET, max_entries=200000):
+        self.geometry = geometry
+        self.time_budget = time_budget
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        self.deadline = 0.0
+        self.stop = None
+        self.nodes = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+
+    def evaluate(self, mover, opponent):
+        score = 0
+        weights = LINE_WEIGHTS
+        for win in self.geometry.win_masks:
+            own = mover & win
+            other = opponent & win
+            if own and not other:
+                score += weights[bin(own).count("1")]
+            elif other and not own:
+                score -= weights[bin(other).count("1")]
+        return score
+
+    def candidates(self, occupied, first=None):
+        geometry = self.geometry
+        if not occupied:
+            return list(geometry.preferred[:1])
+
+        nearby = 0
+        rest = occupied
+        while rest:
+            low = rest & -rest
+            nearby |= geometry.neighbors[low.bit_length() - 1]
+            rest ^= low
+        nearby &= ~occupied
+        if not nearby:
+            nearby = geometry.full_mask & ~occupied
+
+        moves = [cell for cell in geometry.preferred if nearby >> cell & 1]
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def negamax(self, mover, opponent, depth, ply, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 63 == 0 and (time.perf_counter() >= self.deadline
+                                     or self.stop is not None and self.stop.is_set()):
+            raise SearchTimeout()
+
+        geometry = self.geometry
+        occupied = mover | opponent
+        if occupied == geometry.full_mask:
+            return 0
+
+        key = (mover, opponent)
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            entry_depth, flag, stored, first = entry
+            if entry_depth >= depth:
+                score = _win_from_relative(stored, ply)
+                if flag == EXACT:
+                    self.cache_hits += 1
+                    return score
+                if flag == LOWER and score > alpha:
+                    alpha = score
+                elif flag == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    self.cache_hits += 1
+                    return score
+
+        moves = self.candidates(occupied, first)
+        for cell in moves:
+            if geometry.is_win_through(mover | 1 << cell, cell):
+                return WIN_SCORE - ply
+
+        if depth <= 0:
+            if ply > self.max_depth:
+                self.max_depth = ply
+            return self.evaluate(mover, opponent)
+
+        original_alpha = alpha
+        best_score = -INF
+        best_move = moves[0]
+        for cell in moves:
+            score = -self.negamax(opponent, mover | 1 << cell, depth - 1, ply + 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = cell
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table = self.table
+        table[key] = (depth, flag, _win_to_relative(best_score, ply), best_move)
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+        return best_score
+
+    def fallback_move(self, mover, opponent):
+        geometry = self.geometry
+        occupied = mover | opponent
+        move = engine.winning_move(mover, occupied, geometry)
+        if move is None:
+            move = engine.winning_move(opponent, occupied, geometry)
+        if move is None:
+            for cell in geometry.preferred:
+                if not occupied >> cell & 1:
+                    return cell
+        return move
+
+    def best_move(self, board, ai="O", player="X"):
+        started = time.perf_counter()
+        self.deadline = started + self.time_budget * (1 - SAFETY_MARGIN)
+        self.nodes = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+
+        mover = board.mask(ai)
+        opponent = board.mask(player)
+        occupied = mover | opponent
+        best_move = self.fallback_move(mover, opponent)
+        if best_move is None or engine.winning_move(mover, occupied, self.geometry) is not None:
+            return best_move
+
+        remaining = self.geometry.cells - bin(occupied).count("1")
+        try:
+            for depth in range(1, remaining + 1):
+                best_score = -INF
+                depth_best = None
+                alpha = -INF
+                for cell in self.candidates(occupied, best_move):
+                    score = -self.negamax(opponent, mover | 1 << cell, depth - 1, 1, -INF, -alpha)
+                    if score > best_score:
+                        best_score = score
+                        depth_best = cell
+                        if score > alpha:
+                            alpha = score
+                best_move = depth_best
+                if abs(best_score) >= WIN_SCORE - remaining:
+                    break
+        except SearchTimeout:
+            pass
+        return best_move
+
+
+_timed_searches = {}
+
+
+def timed_search(geometry, time_budget=engine.DEFAULT_TIME_BUDGET):
+    searcher = _timed_searches.get(geometry)
+    if searcher is None:
+        searcher = _timed_searches[geometry] = IterativeDeepeningSearch(geometry)
+    searcher.time_budget = time_budget
+    return searcher
+
+
+def timed_best_move(board, ai="O", player="X", time_budget=engine.DEFAULT_TIME_BUDGET):
+    return timed_search(board.geometry, time_budget).best_move(board, ai, player)
+
+
+def count_minimax_nodes(ai_mask, player_mask, is_maximizing):
+    if engine.WINS[ai_mask] or engine.WINS[player_mask]:
+        return 1
+    occupied = ai_mask | player_mask
+    if occupied == engine.FULL_MASK:
+        return 1
+    nodes = 1
+    for i in range(engine.CELLS):
+        b = 1 << i
+        if not occupied & b:
+            if is_maximizing:
+                nodes += count_minimax_nodes(ai_mask | b, player_mask, False)
+            else:
+                nodes += count_minimax_nodes(ai_mask, player_mask | b, True)
+    return nodes
+
+
+def compare(positions):
+    plain_nodes = 0
+    pruned_nodes = 0
+    cache_hits = 0
+    search = AlphaBetaSearch()
+    mismatches = []
+    for board in positions:
+        ai_mask = board.mask("O")
+        player_mask = board.mask("X")
+        for i in board.empty():
+            plain_nodes += count_minimax_nodes(ai_mask | 1 << i, player_mask, False)
+        if search.best_move(board) != engine.minimax_best_move(board):
+            mismatches.append(board)
+        pruned_nodes += search.nodes
+        cache_hits += search.cache_hits
+    return plain_nodes, pruned_nodes, cache_hits, mismatches
+
+
+def ai_turn_positions():
+    positions = []
+    seen = set()
+
+    def visit(board, turn):
+        key = (board.x, board.o)
+        if key in seen or board.is_over():
+            return
+        seen.add(key)
+        if turn == "O":
+            positions.append(board.copy())
+        for i in board.empty():
+            board.place(i, turn)
+            visit(board, "O" if turn == "X" else "X")
+            board.remove(i)
+
+    visit(engine.Board(), "X")
+    return positions
+
+
+def main():
+    positions = ai_turn_positions()
+    plain_nodes, pruned_nodes, cache_hits, mismatches = compare(positions)
+    print(f"Positions:        {len(positions)}")
+    print(f"Minimax nodes:    {plain_nodes}")
+    print(f"Alpha-beta nodes: {pruned_nodes} ({plain_nodes / max(1, pruned_nodes):.1f}x fewer)")
+    print(f"Cache hits:       {cache_hits}")
+    print(f"Mismatches:       {len(mismatches)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
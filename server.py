@@ -0,0 +1,343 @@
+import argparse
+import array
+import asyncio
+import functools
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from batching import DEFAULT_MAX_BATCH, DEFAULT_WINDOW_MS, MoveBatcher
+from telemetry import PERCENTILES, percentile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MIN_SIZE = 3
+MAX_SIZE = 7
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Session:
+    __slots__ = ("id", "board", "difficulty", "player", "ai", "busy")
+
+    def __init__(self, session_id, geometry, difficulty, player="X"):
+        self.id = session_id
+        self.board = engine.Board(geometry=geometry)
+        self.difficulty = difficulty
+        self.player = player
+        self.ai = "O" if player == "X" else "X"
+        self.busy = False
+
+    def turn(self):
+        return "X" if bin(self.board.x).count("1") == bin(self.board.o).count("1") else "O"
+
+    def state(self):
+        board = self.board
+        return {
+            "session": self.id,
+            "board": "".join(board[i] or "." for i in range(len(board))),
+            "turn": self.turn(),
+            "winner": board.winner(),
+            "over": board.is_over()
+        }
+
+
+def runs_inline(board, difficulty):
+    if difficulty == "Expert":
+        return board.geometry.cells <= engine.LOOKUP_TABLE_CELLS
+    return difficulty != "MCTS"
+
+
+class GameServer:
+    def __init__(self, executor, time_budget=engine.DEFAULT_TIME_BUDGET, batcher=None):
+        self.executor = executor
+        self.time_budget = time_budget
+        self.batcher = batcher
+        self.ids = itertools.count(1)
+        self.sessions = {}
+        self.moves = 0
+
+    async def handle(self, reader, writer):
+        owned = set()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, owned, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def respond(self, line, owned, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ProtocolError("Request must be a JSON object")
+            request_id = request.get("id")
+            response = await self.dispatch(request, owned)
+            response["ok"] = True
+        except (ProtocolError, ValueError, TypeError) as exc:
+            response = {"ok": False, "error": str(exc)}
+        except Exception as exc:
+            # A bug on our side still gets an answer, or the client would wait on this line forever.
+            response = {"ok": False, "error": f"Internal error: {type(exc).__name__}: {exc}"}
+        response["id"] = request_id
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    async def dispatch(self, request, owned):
+        op = request.get("op")
+        if op == "new":
+            return await self.new_session(request, owned)
+        if op == "stats":
+            response = {"sessions": len(self.sessions), "moves": self.moves}
+            if self.batcher is not None:
+                response["batching"] = self.batcher.stats.report()
+            return response
+
+        session_id = request.get("session")
+        if session_id not in owned:
+            raise ProtocolError(f"Unknown session: {session_id}")
+        session = self.sessions[session_id]
+        if op == "move":
+            return await self.move(session, request.get("cell"))
+        if op == "state":
+            return session.state()
+        if op == "close":
+            owned.discard(session_id)
+            del self.sessions[session_id]
+            return {"session": session_id}
+        raise ProtocolError(f"Unknown op: {op}")
+
+    async def new_session(self, request, owned):
+        difficulty = request.get("difficulty", "Hard")
+        if difficulty not in engine.DIFFICULTIES:
+            raise ProtocolError(f"Unknown difficulty: {difficulty}")
+        size = request.get("size", 3)
+        win_length = request.get("win_length", size)
+        if not (isinstance(size, int) and isinstance(win_length, int)
+                and MIN_SIZE <= win_length <= size <= MAX_SIZE):
+            raise ProtocolError(f"Unsupported board: size={size}, win_length={win_length}")
+        player = request.get("player", "X")
+        if player not in ("X", "O"):
+            raise ProtocolError(f"Player must be X or O, not {player}")
+
+        session = Session(next(self.ids), engine.geometry_for(size, win_length), difficulty, player)
+        self.sessions[session.id] = session
+        owned.add(session.id)
+        response = session.state()
+        if player == "O":
+            response["ai_move"] = await self.ai_turn(session)
+            response.update(session.state())
+        return response
+
+    async def move(self, session, cell):
+        board = session.board
+        if session.busy:
+            raise ProtocolError("AI is still thinking")
+        if board.is_over():
+            raise ProtocolError("Game is over")
+        if session.turn() != session.player:
+            raise ProtocolError("Not your turn")
+        if not (isinstance(cell, int) and 0 <= cell < len(board)) or not board.is_empty(cell):
+            raise ProtocolError(f"Illegal move: {cell}")
+
+        board.place(cell, session.player)
+        self.moves += 1
+        response = {"ai_move": None}
+        if not board.is_over():
+            response["ai_move"] = await self.ai_turn(session)
+        response.update(session.state())
+        return response
+
+    async def ai_turn(self, session):
+        board = session.board
+        if runs_inline(board, session.difficulty):
+            move = engine.get_ai_move(board, session.difficulty, session.ai, session.player)
+        else:
+            session.busy = True
+            try:
+                if self.batcher is not None and session.difficulty == "Expert":
+                    move = await self.batcher.best_move(board, session.ai, session.player)
+                else:
+                    move = await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(
+                        engine.get_ai_move, board.copy(), session.difficulty, session.ai, session.player,
+                        time_budget=self.time_budget
+                    ))
+            finally:
+                session.busy = False
+        board.place(move, session.ai)
+        self.moves += 1
+        return move
+
+
+async def serve(host, port, workers, time_budget, batch_window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+    import perfect_play
+
+    perfect_play.load()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        batcher = None
+        if max_batch > 1:
+            batcher = MoveBatcher(executor, batch_window_ms, max_batch, time_budget)
+        game_server = GameServer(executor, time_budget, batcher)
+        server = await asyncio.start_server(game_server.handle, host, port)
+        print(f"Serving on {host}:{server.sockets[0].getsockname()[1]}", flush=True)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        async with server:
+            await stop.wait()
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.pending = {}
+
+    async def request(self, payload):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        payload["id"] = request_id
+        self.writer.write(json.dumps(payload).encode() + b"\n")
+        response = await future
+        if not response["ok"]:
+            raise ProtocolError(response["error"])
+        return response
+
+    async def read_responses(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            self.pending.pop(response["id"]).set_result(response)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("Server closed the connection"))
+
+
+async def play_session(connection, new_game, deadline, latencies, rng):
+    while time.monotonic() < deadline:
+        state = await connection.request(dict(new_game))
+        while not state["over"] and time.monotonic() < deadline:
+            empty = [i for i, cell in enumerate(state["board"]) if cell == "."]
+            started = time.perf_counter()
+            state = await connection.request({"op": "move", "session": state["session"], "cell": rng.choice(empty)})
+            latencies.append((time.perf_counter() - started) * 1000)
+        await connection.request({"op": "close", "session": state["session"]})
+
+
+async def generate_load(host, port, sessions, connections, duration, new_game, seed):
+    connections = max(1, min(connections, sessions))
+    opened = [Connection(*await asyncio.open_connection(host, port)) for _ in range(connections)]
+    readers = [asyncio.create_task(connection.read_responses()) for connection in opened]
+    latencies = array.array("d")
+    rng = random.Random(seed)
+
+    started = time.monotonic()
+    await asyncio.gather(*(
+        play_session(opened[i % connections], new_game, started + duration, latencies, rng)
+        for i in range(sessions)
+    ))
+    elapsed = time.monotonic() - started
+    stats = await opened[0].request({"op": "stats"})
+
+    for connection in opened:
+        connection.writer.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    return latencies, elapsed, stats
+
+
+async def run_load(args):
+    server = None
+    port = args.port
+    if args.spawn:
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "serve", "--host", args.host, "--port", "0",
+            "--workers", str(args.workers), "--time-budget", str(args.time_budget),
+            "--batch-window-ms", str(args.batch_window_ms), "--max-batch", str(args.max_batch),
+            stdout=asyncio.subprocess.PIPE
+        )
+        line = (await server.stdout.readline()).decode()
+        port = int(line.rsplit(":", 1)[1])
+
+    new_game = {"op": "new", "difficulty": args.difficulty, "size": args.size,
+                "win_length": args.size if args.win_length is None else args.win_length}
+    try:
+        latencies, elapsed, stats = await generate_load(
+            args.host, port, args.sessions, args.connections, args.duration, new_game, args.seed
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            await server.wait()
+
+    values = sorted(latencies)
+    tails = " | ".join(f"p{pct} {percentile(values, pct):.2f} ms" for pct in PERCENTILES)
+    print(f"{args.sessions} sessions over {min(args.connections, args.sessions)} connections, "
+          f"{args.difficulty} on {args.size}x{args.size}, {elapsed:.1f} s")
+    print(f"{len(values) / elapsed:,.0f} moves/s | {tails} | max {values[-1] if values else 0:.2f} ms")
+    batching = stats.get("batching")
+    if batching and batching["requests"]:
+        print(f"Expert batching: {batching['batches']} batches, {batching['mean_batch']:.1f} requests/batch, "
+              f"{batching['unique_ratio']:.0%} unique, {batching['mean_wait_ms']:.2f} ms queued, "
+              f"{batching['mean_solve_ms']:.2f} ms/batch")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve AI games over newline-delimited JSON, or load-test a server.")
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for Expert searches on large boards")
+    parser.add_argument("--time-budget", type=float, default=engine.DEFAULT_TIME_BUDGET)
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="how long Expert requests wait to be batched together")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="flush an Expert batch at this many requests; 1 turns batching off")
+    parser.add_argument("--spawn", action="store_true", help="load: start a local server first")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--difficulty", choices=engine.DIFFICULTIES, default="Hard")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.host, args.port, args.workers, args.time_budget,
+                              args.batch_window_ms, args.max_batch))
+        else:
+            asyncio.run(run_load(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import argparse
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+import engine
+
+# Moves per second; None plays as fast as the frame budget allows.
+SPEEDS = {
+    "Slow": 2,
+    "Normal": 8,
+    "Fast": 60,
+    "Max": None
+}
+FRAME_MS = 16
+SCORE_INTERVAL_MS = 250
+END_PAUSE_MOVES = 3
+TIME_BUDGET = 0.05
+
+
+class Spectator:
+    # Plays AI-vs-AI games on `board` at a given speed. `run` belongs on a worker thread and
+    # publishes a copy of the board as `position` after every move; the front end draws only the
+    # newest position once per frame, so games finished between two frames are never drawn.
+    def __init__(self, board, first, second, speed=None, rng=None, time_budget=TIME_BUDGET, searchers=None):
+        self.board = board
+        self.policies = {"X": first, "O": second}
+        self.speed = speed
+        self.rng = rng or random.Random()
+        self.time_budget = time_budget
+        self.searchers = searchers
+        self.turn = "X"
+        self.results = {"X": 0, "O": 0, None: 0}
+        self.games = 0
+        self.moves = 0
+        self.started = time.perf_counter()
+        board.clear()
+        self.position = board.copy()
+
+    def step(self, stop=None):
+        board = self.board
+        if board.is_over():
+            board.clear()
+            self.turn = "X"
+        turn = self.turn
+        other = "O" if turn == "X" else "X"
+        move = engine.get_ai_move(board, self.policies[turn], turn, other, self.rng, self.time_budget,
+                                  self.searchers, stop)
+        if stop is not None and stop.is_set():
+            # The search was cut short, so its move is not worth showing.
+            return False
+        board.place(move, turn)
+        self.moves += 1
+        self.position = board.copy()
+        if board.is_over():
+            self.results[board.winner()] += 1
+            self.games += 1
+            return True
+        self.turn = other
+        return False
+
+    def run(self, stop):
+        # Plays until `stop` is set. Pauses wait on `stop` itself, so cancelling never sits out a
+        # pause, and falling behind is forgotten rather than caught up in a burst.
+        due = time.perf_counter()
+        while not stop.is_set():
+            finished = self.step(stop)
+            speed = self.speed
+            if speed is None:
+                continue
+            due = max(due, time.perf_counter() - 1 / speed) + (1 + END_PAUSE_MOVES * finished) / speed
+            stop.wait(max(0.0, due - time.perf_counter()))
+
+    def games_per_minute(self):
+        elapsed = time.perf_counter() - self.started
+        return self.games * 60 / elapsed if elapsed else 0.0
+
+    def score_text(self):
+        results = self.results
+        return (f"🎬 X {self.policies['X']}: {results['X']} | O {self.policies['O']}: {results['O']} | "
+                f"Draws: {results[None]}\n{self.games:,} games | {self.games_per_minute():,.0f} games/min")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test AI-vs-AI autoplay without a display.")
+    parser.add_argument("--pair", nargs=2, default=["Hard", "Expert"], choices=engine.DIFFICULTIES)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    board = engine.Board(geometry=engine.geometry_for(args.size, args.win_length))
+    spectator = Spectator(board, *args.pair, rng=random.Random(args.seed), searchers={})
+    tracemalloc.start()
+    baseline = None
+    stop = threading.Event()
+    worker = threading.Thread(target=spectator.run, args=(stop,), name="spectator")
+    worker.start()
+    # Stands in for the window's frame tick: it only picks up the newest position.
+    shown = None
+    frames = drawn = 0
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        time.sleep(FRAME_MS / 1000)
+        frames += 1
+        if spectator.position is not shown:
+            shown = spectator.position
+            drawn += 1
+        if baseline is None and spectator.games:
+            baseline = tracemalloc.get_traced_memory()[0]
+    stop.set()
+    worker.join()
+    current, peak = tracemalloc.get_traced_memory()
+    print(spectator.score_text())
+    print(f"{spectator.moves:,} moves, {drawn:,} of {frames:,} frames redrawn")
+    print(f"Traced memory: {(current - (baseline or 0)) / 1024:+.1f} KiB since the first game, peak {peak / 1024:.0f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
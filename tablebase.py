@@ -0,0 +1,382 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from functools import lru_cache
+from itertools import combinations
+
+import engine
+
+MAGIC = b"TTTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxII")
+SIZE = 4
+CELLS = SIZE * SIZE
+POSITIONS = 3 ** CELLS
+ALL_LAYERS = (1 << (CELLS + 1)) - 1
+
+# One byte per position, mover to play: outcome in the low two bits, plies to the end above.
+UNKNOWN = 0
+LOSS = 1
+DRAW = 2
+WIN = 3
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ternary weights of the low and high byte of a 16-bit mask: mover + 2 * opponent is a perfect hash.
+TERNARY_LOW = tuple(sum(3 ** i for i in range(8) if mask >> i & 1) for mask in range(256))
+TERNARY_HIGH = tuple(weight * 3 ** 8 for weight in TERNARY_LOW)
+
+
+def position_index(mover_mask, opponent_mask):
+    return (TERNARY_LOW[mover_mask & 0xFF] + TERNARY_HIGH[mover_mask >> 8]
+            + 2 * (TERNARY_LOW[opponent_mask & 0xFF] + TERNARY_HIGH[opponent_mask >> 8]))
+
+
+def entry_score(entry):
+    outcome, distance = entry & 3, entry >> 2
+    if outcome == WIN:
+        return 128 - distance
+    if outcome == DRAW:
+        return 64
+    if outcome == LOSS:
+        return 1 + distance
+    return 0
+
+
+def parent_entry(entry):
+    outcome, distance = entry & 3, entry >> 2
+    if outcome == UNKNOWN:
+        return UNKNOWN
+    return (distance + 1) << 2 | (WIN, DRAW, LOSS)[outcome - 1]
+
+
+# How good a child entry is for the player who moved into it; higher is better, 0 is unknown.
+CHILD_SCORES = tuple(entry_score(parent_entry(entry)) for entry in range(256))
+
+
+def default_path(geometry):
+    return os.path.join(BASE_DIR, f"tablebase_{geometry.size}x{geometry.size}_{geometry.win_length}.bin")
+
+
+def read_header(buffer, source=None):
+    magic, version, size, win_length, count, layers = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION or size != SIZE or count != POSITIONS:
+        raise ValueError(f"Incompatible tablebase: {source or 'buffer'}")
+    if len(buffer) != HEADER.size + POSITIONS:
+        raise ValueError(f"Truncated tablebase: {source or 'buffer'}")
+    return engine.geometry_for(size, win_length), layers
+
+
+class Tablebase:
+    def __init__(self, buffer, source=None):
+        geometry, layers = read_header(buffer, source)
+        if layers != ALL_LAYERS:
+            raise ValueError(f"Unfinished tablebase: {source or 'buffer'}")
+        self.buffer = buffer
+        self.source = source
+        self.geometry = geometry
+        self.offset = HEADER.size
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    def entry(self, mover_mask, opponent_mask):
+        return self.buffer[self.offset + position_index(mover_mask, opponent_mask)]
+
+    def outcome(self, mover_mask, opponent_mask):
+        return self.entry(mover_mask, opponent_mask) & 3
+
+    def distance(self, mover_mask, opponent_mask):
+        return self.entry(mover_mask, opponent_mask) >> 2
+
+    def best_move(self, mover_mask, opponent_mask):
+        # Fastest win, else a draw, else the slowest loss; ties go to the lowest cell.
+        buffer = self.buffer
+        base = self.offset + TERNARY_LOW[opponent_mask & 0xFF] + TERNARY_HIGH[opponent_mask >> 8]
+        occupied = mover_mask | opponent_mask
+        best_move = None
+        best_score = 0
+        for cell in range(CELLS):
+            bit = 1 << cell
+            if occupied & bit:
+                continue
+            moved = mover_mask | bit
+            score = CHILD_SCORES[buffer[base + 2 * (TERNARY_LOW[moved & 0xFF] + TERNARY_HIGH[moved >> 8])]]
+            if score > best_score:
+                best_score = score
+                best_move = cell
+        return best_move
+
+
+_tables = {}
+
+
+def load(geometry, path=None):
+    if geometry.cells != CELLS:
+        return None
+    path = path or default_path(geometry)
+    table = _tables.get(path)
+    if table is None:
+        try:
+            table = Tablebase.open(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if table.geometry is not geometry:
+            return None
+        _tables[path] = table
+    return table
+
+
+def lookup_move(geometry, mover_mask, opponent_mask):
+    table = load(geometry)
+    if table is None:
+        return None
+    return table.best_move(mover_mask, opponent_mask)
+
+
+@lru_cache(maxsize=None)
+def generation_tables(geometry):
+    import batching
+
+    wins = bytearray(1 << CELLS)
+    for mask in range(1 << CELLS):
+        wins[mask] = geometry.is_win(mask)
+    perms = batching.symmetries(SIZE)[0]
+    low = tuple(tuple(batching.transform_mask(mask, perm) for mask in range(256)) for perm in perms)
+    high = tuple(tuple(batching.transform_mask(mask << 8, perm) for mask in range(256)) for perm in perms)
+    ternary_low = tuple(tuple(position_index(mask, 0) for mask in table) for table in low)
+    ternary_high = tuple(tuple(position_index(mask, 0) for mask in table) for table in high)
+    return wins, low, high, ternary_low, ternary_high
+
+
+def create(path, geometry):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, geometry.size, geometry.win_length, POSITIONS, 0))
+        f.truncate(HEADER.size + POSITIONS)
+    os.replace(tmp_path, path)
+
+
+def solved_layers(path, geometry):
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        table_geometry, layers = read_header(buffer, path)
+    except (ValueError, struct.error):
+        return None
+    finally:
+        buffer.close()
+    return layers if table_geometry is geometry else None
+
+
+def mark_solved(path, layer):
+    with open(path, "r+b") as f:
+        buffer = mmap.mmap(f.fileno(), 0)
+        fields = list(HEADER.unpack_from(buffer, 0))
+        fields[-1] |= 1 << layer
+        HEADER.pack_into(buffer, 0, *fields)
+        buffer.flush()
+        buffer.close()
+
+
+def solve_part(path, geometry, layer, part, parts):
+    # Solves every canonical position with `layer` stones whose opponent set falls in this part,
+    # reading children from layer + 1, and writes the result to all eight symmetric images.
+    wins, low, high, ternary_low, ternary_high = generation_tables(geometry)
+    symmetries = range(1, len(low))
+    mover_count = layer // 2
+    opponent_count = layer - mover_count
+    draw = (CELLS - layer) << 2 | DRAW
+    solved = 0
+
+    with open(path, "r+b") as f:
+        buffer = mmap.mmap(f.fileno(), 0)
+    offset = HEADER.size
+    for number, cells in enumerate(combinations(range(CELLS), opponent_count)):
+        if number % parts != part:
+            continue
+        opponent = sum(1 << cell for cell in cells)
+        lo, hi = opponent & 0xFF, opponent >> 8
+        stabilizer = []
+        for s in symmetries:
+            image = low[s][lo] | high[s][hi]
+            if image < opponent:
+                break
+            if image == opponent:
+                stabilizer.append(s)
+        else:
+            images = [offset + 2 * (ternary_low[s][lo] + ternary_high[s][hi]) for s in range(len(low))]
+            child_base = offset + TERNARY_LOW[lo] + TERNARY_HIGH[hi]
+            opponent_won = wins[opponent]
+            free = [cell for cell in range(CELLS) if not opponent >> cell & 1]
+            for movers in combinations(free, mover_count):
+                mover = sum(1 << cell for cell in movers)
+                if wins[mover]:
+                    continue
+                mlo, mhi = mover & 0xFF, mover >> 8
+                if any(low[s][mlo] | high[s][mhi] < mover for s in stabilizer):
+                    continue
+
+                if opponent_won:
+                    entry = LOSS
+                elif layer == CELLS:
+                    entry = DRAW
+                else:
+                    best_score = 0
+                    for cell in free:
+                        bit = 1 << cell
+                        if mover & bit:
+                            continue
+                        moved = mover | bit
+                        score = CHILD_SCORES[buffer[child_base + 2 * (TERNARY_LOW[moved & 0xFF]
+                                                                      + TERNARY_HIGH[moved >> 8])]]
+                        if score > best_score:
+                            best_score = score
+                    if best_score > 64:
+                        entry = (128 - best_score) << 2 | WIN
+                    elif best_score == 64:
+                        entry = draw
+                    elif best_score:
+                        entry = (best_score - 1) << 2 | LOSS
+                    else:
+                        raise RuntimeError(f"Layer {layer + 1} is missing children of {mover:#06x}/{opponent:#06x}")
+
+                for s, image in enumerate(images):
+                    buffer[image + ternary_low[s][mlo] + ternary_high[s][mhi]] = entry
+                solved += 1
+    buffer.flush()
+    buffer.close()
+    return solved
+
+
+def generate(geometry, path=None, workers=None, progress=None):
+    # Retrograde from the full board back to the empty one, one layer of stones at a time.
+    # Finished layers are recorded in the header, so an interrupted run picks up where it stopped.
+    path = path or default_path(geometry)
+    workers = workers or os.cpu_count() or 1
+    layers = solved_layers(path, geometry)
+    if layers is None:
+        create(path, geometry)
+        layers = 0
+
+    executor = None
+    if workers > 1:
+        # Imported here: multiprocessing is slow to load and lookups never need it.
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for layer in range(CELLS, -1, -1):
+            if layers >> layer & 1:
+                continue
+            started = time.perf_counter()
+            if executor is None:
+                solved = solve_part(path, geometry, layer, 0, 1)
+            else:
+                parts = workers * 4
+                solved = sum(executor.map(
+                    solve_part, [path] * parts, [geometry] * parts, [layer] * parts, range(parts), [parts] * parts
+                ))
+            mark_solved(path, layer)
+            if progress is not None:
+                progress(layer, solved, time.perf_counter() - started)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return path
+
+
+def verify(table, samples, rng):
+    # Checks random positions against their children, with wins detected independently of the table.
+    geometry = table.geometry
+    checked = 0
+    mismatches = []
+    while checked < samples:
+        layer = rng.randint(0, CELLS)
+        cells = rng.sample(range(CELLS), layer)
+        mover = sum(1 << cell for cell in cells[:layer // 2])
+        opponent = sum(1 << cell for cell in cells[layer // 2:])
+        if geometry.is_win(mover):
+            continue
+        entry = table.entry(mover, opponent)
+        if geometry.is_win(opponent):
+            expected = LOSS
+        elif layer == CELLS:
+            expected = DRAW
+        else:
+            best = 0
+            for cell in geometry.empty_cells(mover | opponent):
+                moved = mover | 1 << cell
+                score = 127 if geometry.is_win(moved) else CHILD_SCORES[table.entry(opponent, moved)]
+                best = max(best, score)
+            expected = ((128 - best) << 2 | WIN if best > 64 else
+                        (CELLS - layer) << 2 | DRAW if best == 64 else (best - 1) << 2 | LOSS)
+        if entry != expected:
+            mismatches.append((mover, opponent))
+        checked += 1
+    return checked, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the 4×4 Expert tablebase.")
+    parser.add_argument("command", choices=["generate", "verify", "probe"])
+    parser.add_argument("--win-length", type=int, default=SIZE)
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    geometry = engine.geometry_for(SIZE, args.win_length)
+    path = args.path or default_path(geometry)
+
+    if args.command == "generate":
+        def progress(layer, solved, elapsed):
+            print(f"Layer {layer:>2}: {solved:>9,} canonical positions in {elapsed:6.1f} s", flush=True)
+
+        started = time.perf_counter()
+        generate(geometry, path, args.workers, progress)
+        print(f"Wrote {path} in {time.perf_counter() - started:.1f} s")
+        return 0
+
+    table = Tablebase.open(path)
+    if args.command == "verify":
+        checked, mismatches = verify(table, args.samples, random.Random(args.seed))
+        print(f"Checked {checked} random positions against their children: {len(mismatches)} mismatches")
+        for mover, opponent in mismatches[:10]:
+            print(f"  mover={mover:016b} opponent={opponent:016b}")
+        return 1 if mismatches else 0
+
+    outcome = ("unknown", "loss", "draw", "win")[table.outcome(0, 0)]
+    print(f"Empty {geometry.name}: first player {outcome} in {table.distance(0, 0)} plies")
+    rng = random.Random(args.seed)
+    positions = []
+    for _ in range(args.samples):
+        board = engine.Board(geometry=geometry)
+        turn = "X"
+        for _ in range(rng.randint(0, CELLS - 1)):
+            board.place(rng.choice(board.empty()), turn)
+            turn = "O" if turn == "X" else "X"
+            if board.is_over():
+                break
+        if not board.is_over():
+            positions.append((board.mask(turn), board.mask("O" if turn == "X" else "X")))
+    started = time.perf_counter()
+    for mover, opponent in positions:
+        table.best_move(mover, opponent)
+    elapsed = time.perf_counter() - started
+    print(f"{len(positions) / elapsed:,.0f} best-move lookups/s ({elapsed / len(positions) * 1e6:.1f} µs each)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from collections import deque
+
+import engine
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Telemetry:
+    def __init__(self, enabled=True, window=1000, path=None, callback=None):
+        self.enabled = enabled
+        self.window = deque(maxlen=window)
+        self.path = path
+        self.callback = callback
+        self.count = 0
+        self.lock = threading.Lock()
+        self.file = None
+
+    def ai_move(self, board, difficulty, ai="O", player="X", **kwargs):
+        if not self.enabled:
+            return engine.get_ai_move(board, difficulty, ai, player, **kwargs)
+
+        started = time.perf_counter()
+        move, branch, searcher = engine.choose_ai_move(board, difficulty, ai, player, **kwargs)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        self.record({
+            "time": time.time(),
+            "difficulty": difficulty,
+            "board": board.geometry.name,
+            "ply": bin(board.occupied).count("1"),
+            "move": move,
+            "branch": branch,
+            "wall_ms": wall_ms,
+            "nodes": searcher.nodes if searcher is not None else 0,
+            "max_depth": searcher.max_depth if searcher is not None else 0,
+            "cache_hits": searcher.cache_hits if searcher is not None else None
+        })
+        return move
+
+    def record(self, record):
+        with self.lock:
+            self.window.append(record["wall_ms"])
+            self.count += 1
+            if self.path is not None:
+                if self.file is None:
+                    self.file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self.file.write(json.dumps(record) + "\n")
+        if self.callback is not None:
+            self.callback(record)
+
+    def percentiles(self):
+        with self.lock:
+            values = sorted(self.window)
+        return {pct: percentile(values, pct) for pct in PERCENTILES}
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
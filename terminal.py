@@ -0,0 +1,224 @@
+import argparse
+import random
+import sys
+
+import engine
+import gamestate
+
+# Cheap to import on purpose: this front end must start fast and never pulls in tkinter.
+ULTIMATE_BLOCK = 3
+
+
+def new_board(size=3, win_length=None, ultimate=False):
+    if ultimate:
+        import ultimate as rules
+        return rules.UltimateBoard()
+    return engine.Board(geometry=engine.geometry_for(size, win_length))
+
+
+def block_of(board):
+    return None if isinstance(board, engine.Board) else ULTIMATE_BLOCK
+
+
+def grid_index(board, row, col):
+    size = board.geometry.size
+    block = block_of(board)
+    if block is None:
+        return row * size + col
+    block_index = row // block * (size // block) + col // block
+    return block_index * block * block + row % block * block + col % block
+
+
+def render(board):
+    size = board.geometry.size
+    block = block_of(board)
+    numbered = block is None
+    width = len(str(len(board))) if numbered else 1
+    legal = set() if numbered or board.is_over() else set(board.legal_moves())
+
+    def line(label, items, gap=" ", wall="|"):
+        # Joins one row of cells, with a wall between ultimate sub-boards.
+        text = ""
+        for col, item in enumerate(items):
+            if col:
+                text += gap + wall + gap if block and col % block == 0 else gap
+            text += f"{item:>{width}}"
+        return f"{label:>2} {text}".rstrip()
+
+    lines = [line("", (col + 1 for col in range(size)), wall=" ")]
+    for row in range(size):
+        if block and row and row % block == 0:
+            lines.append(line("", ("-" * width for _ in range(size)), "-", "+"))
+        marks = []
+        for col in range(size):
+            index = grid_index(board, row, col)
+            mark = board[index]
+            if not mark:
+                mark = str(index + 1) if numbered else "." if index in legal else ""
+            marks.append(mark)
+        lines.append(line(row + 1, marks))
+    return "\n".join(lines)
+
+
+def parse_move(board, text):
+    # A cell number on ordinary boards, or "row col" (1-based) on any board.
+    parts = text.replace(",", " ").split()
+    try:
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        return None
+    size = board.geometry.size
+    if len(numbers) == 2 and all(1 <= n <= size for n in numbers):
+        return grid_index(board, numbers[0] - 1, numbers[1] - 1)
+    if len(numbers) == 1 and block_of(board) is None and 1 <= numbers[0] <= len(board):
+        return numbers[0] - 1
+    return None
+
+
+def read_line(prompt):
+    try:
+        return input(prompt).strip()
+    except EOFError:
+        return None
+
+
+def describe_move(board, index):
+    block = block_of(board)
+    if block is None:
+        return str(index + 1)
+    block_index, cell = divmod(index, block * block)
+    block_row, block_col = divmod(block_index, board.geometry.size // block)
+    cell_row, cell_col = divmod(cell, block)
+    return f"{block_row * block + cell_row + 1} {block_col * block + cell_col + 1}"
+
+
+def navigate(board, timeline, human, words):
+    # The u, r, g and b commands; returns the state to show, or None and a message.
+    command = words[0]
+    if command == "u":
+        return timeline.undo_to(human), "Nothing to undo"
+    if command == "r":
+        return timeline.redo_to(human), "Nothing to redo"
+    try:
+        number = int(words[1])
+    except (IndexError, ValueError):
+        number = None
+    if command == "g":
+        last = len(timeline.line) - 1
+        if number is None or not 0 <= number <= last:
+            return None, f"Usage: g PLY, with PLY from 0 (start) to {last}"
+        return timeline.goto(number), ""
+    branches = timeline.branches
+    if not branches:
+        return None, "No other lines yet: undo, then play a different move"
+    if number is None or not 1 <= number <= len(branches):
+        return None, "\n".join(
+            f"  b {i}: {' '.join(describe_move(board, move) for move in branch.moves())}"
+            for i, branch in enumerate(branches, 1)
+        )
+    return timeline.switch(branches[number - 1]), ""
+
+
+def play(board, difficulty, human="X", rng=random, time_budget=engine.DEFAULT_TIME_BUDGET, read=read_line):
+    ai = "O" if human == "X" else "X"
+    scores = {"player": 0, "ai": 0, "draw": 0}
+    while True:
+        board.clear()
+        timeline = gamestate.Timeline(gamestate.GameState(board.geometry))
+        turn = "X"
+        while not board.is_over():
+            if turn == human:
+                print(render(board))
+                line = read(f"Your move ({human}), u/r undo/redo, g N go to ply, b lines, q quit: ")
+                if line is None or line.lower() in ("q", "quit", "exit"):
+                    return scores
+                words = line.lower().split()
+                if words and words[0] in ("u", "r", "g", "b"):
+                    state, message = navigate(board, timeline, human, words)
+                    if state is None:
+                        print(message)
+                        continue
+                    board = state.board()
+                    turn = state.turn
+                    continue
+                move = parse_move(board, line)
+                if move is None or not board.is_legal(move):
+                    print(f"Illegal move: {line}")
+                    continue
+            else:
+                move = engine.get_ai_move(timeline.current.board(), difficulty, ai, human, rng, time_budget)
+                print(f"AI ({difficulty}) plays {describe_move(board, move)}")
+            board.place(move, turn)
+            timeline.play(move)
+            turn = "O" if turn == "X" else "X"
+
+        print(render(board))
+        winner = board.winner()
+        outcome = "draw" if winner is None else "player" if winner == human else "ai"
+        scores[outcome] += 1
+        print({"player": "🎉 You win!", "ai": "🤖 AI wins!", "draw": "🤝 Draw!"}[outcome])
+        print(f"👤 Player: {scores['player']}  |  🤖 AI: {scores['ai']}  |  🤝 Draws: {scores['draw']}")
+        again = read("Play again? [Y/n] ")
+        if again is None or again.lower().startswith("n"):
+            return scores
+
+
+def analyse(board, moves, difficulty, rng=random, time_budget=engine.DEFAULT_TIME_BUDGET):
+    # Replays 0-based cell indices from X, then asks the AI for the side to move.
+    turn = "X"
+    for move in moves:
+        if not 0 <= move < len(board) or board.is_over() or not board.is_legal(move):
+            raise ValueError(f"Illegal move: {move}")
+        board.place(move, turn)
+        turn = "O" if turn == "X" else "X"
+    result = {
+        "board": "".join(board[i] or "." for i in range(len(board))),
+        "turn": turn,
+        "winner": board.winner(),
+        "over": board.is_over(),
+        "ai_move": None,
+        "branch": None
+    }
+    if not result["over"]:
+        other = "O" if turn == "X" else "X"
+        result["ai_move"], result["branch"], _ = engine.choose_ai_move(board, difficulty, turn, other, rng, time_budget)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Tic-Tac-Toe in the terminal, or query the AI without a display.")
+    parser.add_argument("--headless", action="store_true",
+                        help="print the AI's move for the position after --moves as JSON, then exit")
+    parser.add_argument("--moves", type=int, nargs="*", default=[], metavar="CELL",
+                        help="headless: moves played so far as 0-based cell indices, X first")
+    parser.add_argument("--difficulty", choices=engine.DIFFICULTIES, default="Expert")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--ultimate", action="store_true", help="play Ultimate Tic-Tac-Toe")
+    parser.add_argument("--player", choices=["X", "O"], default="X")
+    parser.add_argument("--time-budget", type=float, default=engine.DEFAULT_TIME_BUDGET)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    board = new_board(args.size, args.win_length, args.ultimate)
+    rng = random.Random(args.seed)
+    if args.headless:
+        import json
+
+        try:
+            result = analyse(board, args.moves, args.difficulty, rng, args.time_budget)
+        except ValueError as exc:
+            print(json.dumps({"error": str(exc)}))
+            return 1
+        print(json.dumps(result))
+        return 0
+
+    try:
+        play(board, args.difficulty, args.player, rng, args.time_budget)
+    except KeyboardInterrupt:
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
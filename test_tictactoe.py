@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import engine
+import gamestate
+import history
+import learned
+import mcts
+import records
+import server
+import spectator
+import terminal
+import tournament
+
+
+# The self-checks behind each module's command line, run on every commit.
+
+def test_alpha_beta_matches_minimax():
+    import search
+
+    positions = search.ai_turn_positions()
+    *_, mismatches = search.compare(positions)
+    assert len(positions) == 2097
+    assert mismatches == []
+
+
+def test_perfect_play_table_matches_minimax():
+    import perfect_play
+
+    checked, mismatches = perfect_play.verify(perfect_play.load())
+    assert checked == 4520
+    assert mismatches == []
+
+
+def test_tablebase_matches_its_children():
+    import tablebase
+
+    path = tablebase.default_path(engine.geometry_for(4, 4))
+    if not os.path.exists(path):
+        pytest.skip("no 4x4 tablebase; run python tablebase.py generate")
+    checked, mismatches = tablebase.verify(tablebase.Tablebase.open(path), 20000, random.Random(0))
+    assert checked == 20000
+    assert mismatches == []
+
+
+def test_batch_matches_scalar_engine():
+    np = pytest.importorskip("numpy")
+    import batch
+
+    boards = batch.random_positions(5000, engine.CLASSIC, np.random.default_rng(0))
+    assert batch.check_consistency(batch.BatchEvaluator(engine.CLASSIC), boards) == 0
+
+
+def test_ultimate_perft():
+    import ultimate
+
+    counts = [ultimate.perft(ultimate.UltimateBoard(), depth) for depth in range(1, 6)]
+    assert counts == [81, 720, 6336, 55080, 473256]
+
+
+# Regressions.
+
+def test_history_failure_does_not_lose_the_next_game(tmp_path, monkeypatch):
+    insert_games = history.insert_games
+    failures = [sqlite3.OperationalError("disk I/O error")]
+
+    def flaky_insert(conn, batch):
+        if failures:
+            raise failures.pop()
+        insert_games(conn, batch)
+
+    monkeypatch.setattr(history, "insert_games", flaky_insert)
+    store = history.HistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=0.01)
+    store.record_game(history.GameRecord("Hard", "3x3", "draw", [0, 4, 8]))
+    deadline = time.monotonic() + 5
+    while store.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with pytest.raises(sqlite3.OperationalError):
+        store.record_game(history.GameRecord("Hard", "3x3", "player", [0, 4, 8]))
+    store.flush()
+    assert store.summary("Hard")["games"] == 1
+    store.close()
+
+
+def test_truncated_record_is_a_value_error():
+    for geometry, moves in ((engine.CLASSIC, [0, 4, 8]), (engine.geometry_for(7, 5), [0, 24, 48])):
+        data = records.encode(records.RecordedGame.from_moves(geometry, "Hard", moves))
+        assert records.decode(data, 0)[1] == len(data)
+        for cut in range(len(data)):
+            with pytest.raises(ValueError):
+                records.decode(data[:cut], 0)
+
+
+@pytest.mark.parametrize("move", [9, 100, -1])
+def test_headless_rejects_cells_off_the_board(move, capsys):
+    assert terminal.main(["--headless", "--moves", str(move)]) == 1
+    assert json.loads(capsys.readouterr().out) == {"error": f"Illegal move: {move}"}
+
+
+def test_stopped_mcts_search_has_no_move():
+    assert mcts.choose({}) is None
+    searcher = mcts.MonteCarloSearch(engine.geometry_for(5, 4), time_budget=2.0)
+    searcher.stop = threading.Event()
+    searcher.stop.set()
+    assert mcts.choose(searcher.search(0, 0)) is None
+
+
+def test_cancelled_parallel_mcts_frees_the_pool():
+    geometry = engine.geometry_for(7, 5)
+    searcher = mcts.MonteCarloSearch(geometry, time_budget=3.0)
+    searcher.stop = threading.Event()
+    threading.Timer(0.2, searcher.stop.set).start()
+    mcts.parallel_search(searcher, 0, 0, workers=2)
+    started = time.perf_counter()
+    mcts.parallel_search(mcts.MonteCarloSearch(geometry, time_budget=0.2), 0, 0, workers=2)
+    assert time.perf_counter() - started < 1.5
+
+
+def test_default_tournament_leaves_out_search_bound_policies():
+    assert "MCTS" not in tournament.DEFAULT_POLICIES
+    assert set(tournament.DEFAULT_POLICIES) < set(engine.DIFFICULTIES)
+
+
+def test_replayed_move_rejoins_its_branch():
+    timeline = gamestate.Timeline(gamestate.GameState(engine.CLASSIC))
+    for move in (0, 4, 8):
+        timeline.play(move)
+    tip = timeline.current
+    timeline.undo(3)
+    timeline.play(1)
+    timeline.undo()
+    timeline.play(0)
+    assert [branch.moves() for branch in timeline.branches] == [[1]]
+    assert timeline.redo(2) is tip
+
+
+def test_unexpected_server_error_still_gets_an_answer():
+    class Writer:
+        def __init__(self):
+            self.lines = []
+
+        def write(self, data):
+            self.lines.append(json.loads(data))
+
+        async def drain(self):
+            pass
+
+    async def broken_dispatch(request, owned):
+        raise KeyError("session")
+
+    game_server = server.GameServer(None)
+    game_server.dispatch = broken_dispatch
+    writer = Writer()
+    asyncio.run(game_server.respond(b'{"op": "state", "id": 7}', set(), writer))
+    assert writer.lines == [{"ok": False, "error": "Internal error: KeyError: 'session'", "id": 7}]
+
+
+def test_missing_learned_policy_is_not_reopened(tmp_path, monkeypatch):
+    opened = []
+    open_policy = learned.LearnedPolicy.open
+
+    def counting_open(path=learned.DEFAULT_PATH):
+        opened.append(path)
+        return open_policy(path)
+
+    monkeypatch.setattr(learned.LearnedPolicy, "open", counting_open)
+    monkeypatch.setattr(learned, "_policy_path", None)
+    path = str(tmp_path / "missing.bin")
+    assert [learned.load(path) for _ in range(3)] == [None, None, None]
+    assert opened == [path]
+
+
+def test_spectator_errors_reach_the_caller(monkeypatch):
+    def broken_move(*args, **kwargs):
+        raise RuntimeError("search failed")
+
+    monkeypatch.setattr(spectator.engine, "get_ai_move", broken_move)
+    watched = spectator.Spectator(engine.Board(), "Hard", "Expert", searchers={})
+    with pytest.raises(RuntimeError):
+        watched.run(threading.Event())
@@ -0,0 +1,191 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+Z_95 = 1.959963984540054
+# MCTS spends its whole time budget on every move, so a default round robin would run for hours;
+# name it in --policies or --pair to include it.
+SEARCH_POLICIES = ("MCTS",)
+DEFAULT_POLICIES = tuple(policy for policy in engine.DIFFICULTIES if policy not in SEARCH_POLICIES)
+
+
+def play_game(first, second, geometry, rng, time_budget=engine.DEFAULT_TIME_BUDGET, moves=None):
+    board = engine.Board(geometry=geometry)
+    policies = {"X": first, "O": second}
+    turn = "X"
+    while True:
+        other = "O" if turn == "X" else "X"
+        move = engine.get_ai_move(board, policies[turn], turn, other, rng, time_budget)
+        board.place(move, turn)
+        if moves is not None:
+            moves.append(move)
+        if board.winner():
+            return turn
+        if board.is_full():
+            return None
+        turn = other
+
+
+def run_chunk(policy_a, policy_b, size, win_length, games, seed, time_budget):
+    started = time.perf_counter()
+    geometry = engine.geometry_for(size, win_length)
+    rng = random.Random(seed)
+    wins = draws = losses = 0
+    for game in range(games):
+        a_symbol = "X" if game % 2 == 0 else "O"
+        if a_symbol == "X":
+            winner = play_game(policy_a, policy_b, geometry, rng, time_budget)
+        else:
+            winner = play_game(policy_b, policy_a, geometry, rng, time_budget)
+        if winner is None:
+            draws += 1
+        elif winner == a_symbol:
+            wins += 1
+        else:
+            losses += 1
+    return wins, draws, losses, time.perf_counter() - started
+
+
+def wilson_interval(successes, total, z=Z_95):
+    if total == 0:
+        return 0.0, 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def split_games(games, chunk_size):
+    # Chunks depend only on the game count, so a seed reproduces the same
+    # games whatever the number of workers.
+    sizes = [chunk_size] * (games // chunk_size)
+    if games % chunk_size:
+        sizes.append(games % chunk_size)
+    return sizes
+
+
+def submit_matchup(executor, policy_a, policy_b, geometry, games, seed, chunk_size, time_budget):
+    return [
+        executor.submit(
+            run_chunk, policy_a, policy_b, geometry.size, geometry.win_length,
+            size, seed * 1000003 + index, time_budget
+        )
+        for index, size in enumerate(split_games(games, chunk_size))
+    ]
+
+
+def collect_matchup(futures):
+    wins = draws = losses = 0
+    worker_seconds = 0.0
+    for future in futures:
+        w, d, l, seconds = future.result()
+        wins += w
+        draws += d
+        losses += l
+        worker_seconds += seconds
+    return wins, draws, losses, worker_seconds
+
+
+def summarize(policy_a, policy_b, wins, draws, losses, worker_seconds):
+    total = wins + draws + losses
+    result = {"policy_a": policy_a, "policy_b": policy_b, "games": total, "worker_seconds": worker_seconds,
+              "games_per_core_second": total / worker_seconds if worker_seconds > 0 else 0.0}
+    for name, count in (("wins", wins), ("draws", draws), ("losses", losses)):
+        low, high = wilson_interval(count, total)
+        result[name] = count
+        result[f"{name}_rate"] = count / total if total else 0.0
+        result[f"{name}_ci95"] = [low, high]
+    return result
+
+
+def format_table(results):
+    lines = [
+        f"{'A':<8} {'B':<8} {'games':>9} {'A win %':>18} {'draw %':>18} {'A loss %':>18} {'games/core/s':>13}",
+        "-" * 98
+    ]
+    for r in results:
+        cells = []
+        for name in ("wins", "draws", "losses"):
+            low, high = r[f"{name}_ci95"]
+            cells.append(f"{r[f'{name}_rate'] * 100:5.1f} [{low * 100:4.1f},{high * 100:5.1f}]")
+        lines.append(
+            f"{r['policy_a']:<8} {r['policy_b']:<8} {r['games']:>9} "
+            f"{cells[0]:>18} {cells[1]:>18} {cells[2]:>18} {r['games_per_core_second']:>13.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless games between AI difficulty levels.")
+    parser.add_argument("--policies", nargs="+", default=list(DEFAULT_POLICIES),
+                        help=f"policies for a round robin (default: {' '.join(DEFAULT_POLICIES)})")
+    parser.add_argument("--pair", nargs=2, action="append", metavar=("A", "B"),
+                        help="play only this pairing; may be repeated")
+    parser.add_argument("--games", type=int, default=10000, help="games per pairing")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=2000,
+                        help="games per task; each task gets its own seed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--time-budget", type=float, default=0.1,
+                        help="Expert search budget per move on larger boards, in seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    for policy in itertools.chain(args.policies, *(args.pair or [])):
+        if policy not in engine.DIFFICULTIES:
+            parser.error(f"unknown policy: {policy}")
+
+    geometry = engine.geometry_for(args.size, args.win_length)
+    pairs = [tuple(pair) for pair in args.pair] if args.pair else list(
+        itertools.combinations_with_replacement(args.policies, 2))
+    chunk_size = max(2, args.chunk_size - args.chunk_size % 2)
+
+    if geometry is engine.CLASSIC:
+        import perfect_play
+        perfect_play.load()
+
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Every chunk of every pairing is queued up front so no worker idles
+        # between pairings.
+        pending = [
+            (policy_a, policy_b, submit_matchup(
+                executor, policy_a, policy_b, geometry, args.games,
+                args.seed + index, chunk_size, args.time_budget
+            ))
+            for index, (policy_a, policy_b) in enumerate(pairs)
+        ]
+        for policy_a, policy_b, futures in pending:
+            result = summarize(policy_a, policy_b, *collect_matchup(futures))
+            results.append(result)
+            if args.json:
+                print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - started
+
+    total_games = sum(r["games"] for r in results)
+    if args.json:
+        print(json.dumps({"games": total_games, "seconds": elapsed, "workers": args.workers,
+                          "games_per_second": total_games / elapsed if elapsed else 0.0}))
+    else:
+        print(f"{geometry.size}x{geometry.size}, {geometry.win_length} in a row, "
+              f"{args.workers} workers, seed {args.seed}")
+        print(format_table(results))
+        print(f"Total: {total_games} games in {elapsed:.1f}s "
+              f"({total_games / elapsed if elapsed else 0:.0f} games/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
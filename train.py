@@ -0,0 +1,164 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import engine
+import learned
+import perfect_play
+import search
+
+DEFAULT_BATCH = 4096
+DEFAULT_ALPHA = 0.5
+DEFAULT_EPSILON = 0.3
+DEFAULT_GAMMA = 0.9
+
+
+def decode_positions():
+    # Mover and opponent masks of every ternary index.
+    index = np.arange(perfect_play.POSITIONS)
+    movers = np.zeros(perfect_play.POSITIONS, dtype=np.int64)
+    opponents = np.zeros(perfect_play.POSITIONS, dtype=np.int64)
+    for i in range(engine.CELLS):
+        index, digit = np.divmod(index, 3)
+        movers |= (digit == 1).astype(np.int64) << i
+        opponents |= (digit == 2).astype(np.int64) << i
+    return movers, opponents
+
+
+class SelfPlayTrainer:
+    # Batched self-play with greedy TD(0) backups on afterstate values, negamax style:
+    # a position is worth the best of -gamma * value(child) over its legal moves.
+    def __init__(self, batch_size=DEFAULT_BATCH, alpha=DEFAULT_ALPHA, epsilon=DEFAULT_EPSILON,
+                 gamma=DEFAULT_GAMMA, seed=None):
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self.gamma = gamma
+        self.rng = np.random.default_rng(seed)
+        self.episodes = 0
+
+        self.ternary = np.array(perfect_play.TERNARY, dtype=np.int64)
+        self.wins = np.frombuffer(engine.WINS, dtype=np.uint8).astype(bool)
+        self.bits = np.array([1 << i for i in range(engine.CELLS)], dtype=np.int64)
+
+        movers, opponents = decode_positions()
+        lost = self.wins[opponents]
+        self.fixed = lost | ((movers | opponents) == engine.FULL_MASK)
+        self.values = np.zeros(perfect_play.POSITIONS, dtype=np.float64)
+        self.values[lost] = -1.0
+
+    def load_values(self, policy):
+        values = np.frombuffer(policy.values, dtype=np.int8).astype(np.float64) / learned.SCALE
+        self.values[~self.fixed] = values[~self.fixed]
+        self.episodes = policy.episodes
+
+    def quantized(self):
+        return np.clip(np.rint(self.values * learned.SCALE), -learned.SCALE, learned.SCALE).astype(np.int8)
+
+    def play_batch(self):
+        count = self.batch_size
+        bits = self.bits
+        mover = np.zeros(count, dtype=np.int64)
+        opponent = np.zeros(count, dtype=np.int64)
+        live = np.arange(count)
+        states = []
+        targets = []
+
+        while live.size:
+            m = mover[live]
+            o = opponent[live]
+            moved = m[:, None] | bits
+            legal = ((m | o)[:, None] & bits) == 0
+            children = np.where(legal, self.ternary[o][:, None] + 2 * self.ternary[moved], 0)
+            scores = -self.gamma * self.values[children]
+            scores[~legal] = -np.inf
+            states.append(self.ternary[m] + 2 * self.ternary[o])
+            targets.append(scores.max(axis=1))
+
+            noise = self.rng.random(scores.shape)
+            greedy = np.where(scores == scores.max(axis=1, keepdims=True), noise, -1.0).argmax(axis=1)
+            noise[~legal] = -1.0
+            explore = self.rng.random(live.size) < self.epsilon
+            moves = np.where(explore, noise.argmax(axis=1), greedy)
+
+            placed = m | bits[moves]
+            over = self.wins[placed] | ((placed | o) == engine.FULL_MASK)
+            mover[live] = o
+            opponent[live] = placed
+            live = live[~over]
+
+        states = np.concatenate(states)
+        targets = np.concatenate(targets)
+        counts = np.bincount(states, minlength=perfect_play.POSITIONS)
+        sums = np.bincount(states, weights=targets, minlength=perfect_play.POSITIONS)
+        seen = (counts > 0) & ~self.fixed
+        self.values[seen] += self.alpha * (sums[seen] / counts[seen] - self.values[seen])
+        self.episodes += count
+        return count
+
+
+def optimal_move_rate(policy, positions, table):
+    # Share of AI-to-move positions where the learned move is one of the perfect-play moves.
+    optimal = 0
+    for board in positions:
+        mover, opponent = board.mask("O"), board.mask("X")
+        move = policy.best_move(mover, opponent)
+        if table.best_moves(mover, opponent) >> move & 1:
+            optimal += 1
+    return optimal / len(positions)
+
+
+def train(trainer, episodes, path, checkpoint_every, progress=None):
+    # Only self-play and updates count towards episodes/s; checkpoints and progress reports do not.
+    elapsed = 0.0
+    played = 0
+    next_checkpoint = checkpoint_every
+    while played < episodes:
+        started = time.perf_counter()
+        played += trainer.play_batch()
+        elapsed += time.perf_counter() - started
+        if played >= next_checkpoint or played >= episodes:
+            next_checkpoint += checkpoint_every
+            learned.save(path, trainer.quantized().tobytes(), trainer.episodes)
+            if progress is not None:
+                progress(trainer, played, elapsed)
+    return played / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the Adaptive difficulty by batched self-play.")
+    parser.add_argument("--episodes", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--checkpoint-every", type=int, default=50000)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON, help="share of exploratory moves")
+    parser.add_argument("--gamma", type=float, default=DEFAULT_GAMMA, help="discount, so faster wins score higher")
+    parser.add_argument("--path", default=learned.DEFAULT_PATH)
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint at --path")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    trainer = SelfPlayTrainer(args.batch_size, args.alpha, args.epsilon, args.gamma, args.seed)
+    if not args.fresh:
+        policy = learned.load(args.path)
+        if policy is not None:
+            trainer.load_values(policy)
+            print(f"Resuming from {args.path} after {policy.episodes:,} episodes")
+
+    positions = search.ai_turn_positions()
+    table = perfect_play.load()
+
+    def progress(trainer, played, elapsed):
+        policy = learned.LearnedPolicy(learned.pack(trainer.quantized().tobytes(), trainer.episodes))
+        print(f"{trainer.episodes:>12,} episodes | {played / elapsed:>10,.0f} episodes/s | "
+              f"optimal moves {optimal_move_rate(policy, positions, table):6.1%}", flush=True)
+
+    rate = train(trainer, args.episodes, args.path, args.checkpoint_every, progress)
+    print(f"Saved {args.path} ({rate:,.0f} episodes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
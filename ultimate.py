@@ -0,0 +1,431 @@
+import argparse
+import random
+import sys
+import time
+
+import engine
+
+WINS = engine.CLASSIC.wins
+WIN_MASKS = engine.CLASSIC.win_masks
+FULL = 0x1FF
+BOARDS = 9
+CELLS = 81
+TIME_BUDGET = 0.2
+SAFETY_MARGIN = 0.1
+
+WIN_SCORE = 1000000
+BOARD_WEIGHT = 100
+LINE_WEIGHTS = (0, 1, 4)
+
+# MOVES[board][free] lists the global moves for the free cells of one sub-board.
+MOVES = tuple(
+    tuple(tuple(board * 9 + cell for cell in range(9) if free >> cell & 1) for free in range(FULL + 1))
+    for board in range(BOARDS)
+)
+
+
+class UltimateGeometry:
+    size = 9
+    win_length = 3
+    cells = CELLS
+    full_mask = (1 << CELLS) - 1
+    name = "ultimate"
+    preferred = tuple(board * 9 + cell for board in engine.PREFERRED for cell in engine.PREFERRED)
+
+    def __repr__(self):
+        return "UltimateGeometry()"
+
+    def __reduce__(self):
+        return _geometry, ()
+
+
+ULTIMATE = UltimateGeometry()
+PREFERRED_RANK = {move: rank for rank, move in enumerate(ULTIMATE.preferred)}
+
+
+def _geometry():
+    return ULTIMATE
+
+
+class UltimateBoard:
+    __slots__ = ("boards_x", "boards_o", "macro_x", "macro_o", "closed", "forced", "history")
+
+    geometry = ULTIMATE
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.boards_x = [0] * BOARDS
+        self.boards_o = [0] * BOARDS
+        self.macro_x = 0
+        self.macro_o = 0
+        self.closed = 0
+        self.forced = -1
+        self.history = []
+
+    @classmethod
+    def from_masks(cls, x, o, last_move=None):
+        # Rebuilds a position from the 81-bit masks; the last move decides which small board is next.
+        board = cls()
+        for index in range(BOARDS):
+            own_x = board.boards_x[index] = x >> 9 * index & FULL
+            own_o = board.boards_o[index] = o >> 9 * index & FULL
+            bit = 1 << index
+            if WINS[own_x]:
+                board.macro_x |= bit
+            elif WINS[own_o]:
+                board.macro_o |= bit
+            elif own_x | own_o != FULL:
+                continue
+            board.closed |= bit
+        if last_move is not None:
+            cell = last_move % 9
+            board.forced = -1 if board.closed >> cell & 1 else cell
+        return board
+
+    def copy(self):
+        board = UltimateBoard.__new__(UltimateBoard)
+        board.boards_x = self.boards_x[:]
+        board.boards_o = self.boards_o[:]
+        board.macro_x = self.macro_x
+        board.macro_o = self.macro_o
+        board.closed = self.closed
+        board.forced = self.forced
+        board.history = self.history[:]
+        return board
+
+    def __getitem__(self, index):
+        board, cell = divmod(index, 9)
+        if self.boards_x[board] >> cell & 1:
+            return "X"
+        if self.boards_o[board] >> cell & 1:
+            return "O"
+        return ""
+
+    def __len__(self):
+        return CELLS
+
+    def __repr__(self):
+        return f"UltimateBoard({''.join(self[i] or '.' for i in range(CELLS))}, forced={self.forced})"
+
+    def mask(self, symbol):
+        boards = self.boards_x if symbol == "X" else self.boards_o
+        return sum(mask << 9 * board for board, mask in enumerate(boards))
+
+    @property
+    def occupied(self):
+        return self.mask("X") | self.mask("O")
+
+    def legal_moves(self):
+        if self.forced >= 0:
+            board = self.forced
+            return list(MOVES[board][~(self.boards_x[board] | self.boards_o[board]) & FULL])
+        moves = []
+        closed = self.closed
+        for board in range(BOARDS):
+            if not closed >> board & 1:
+                moves.extend(MOVES[board][~(self.boards_x[board] | self.boards_o[board]) & FULL])
+        return moves
+
+    def empty(self):
+        return self.legal_moves()
+
+    def is_legal(self, index):
+        board, cell = divmod(index, 9)
+        if self.closed >> board & 1 or self.winner():
+            return False
+        if self.forced >= 0 and board != self.forced:
+            return False
+        return not (self.boards_x[board] | self.boards_o[board]) >> cell & 1
+
+    def is_empty(self, index):
+        return self[index] == ""
+
+    def owners(self):
+        owners = {}
+        for symbol, macro in (("X", self.macro_x), ("O", self.macro_o)):
+            for board in range(BOARDS):
+                if macro >> board & 1:
+                    owners.update((board * 9 + cell, symbol) for cell in range(9))
+        return owners
+
+    def place(self, index, symbol):
+        board, cell = divmod(index, 9)
+        bit = 1 << board
+        closed = 0
+        if symbol == "X":
+            own = self.boards_x[board] = self.boards_x[board] | 1 << cell
+            if WINS[own]:
+                self.macro_x |= bit
+                closed = bit
+        else:
+            own = self.boards_o[board] = self.boards_o[board] | 1 << cell
+            if WINS[own]:
+                self.macro_o |= bit
+                closed = bit
+        if not closed and self.boards_x[board] | self.boards_o[board] == FULL:
+            closed = bit
+        self.closed |= closed
+        self.history.append((index, self.forced, closed))
+        self.forced = -1 if self.closed >> cell & 1 else cell
+
+    def undo(self):
+        index, forced, closed = self.history.pop()
+        board, cell = divmod(index, 9)
+        clear = ~(1 << cell)
+        self.boards_x[board] &= clear
+        self.boards_o[board] &= clear
+        if closed:
+            self.closed &= ~closed
+            self.macro_x &= ~closed
+            self.macro_o &= ~closed
+        self.forced = forced
+        return index
+
+    def winner(self):
+        if WINS[self.macro_x]:
+            return "X"
+        if WINS[self.macro_o]:
+            return "O"
+        return None
+
+    def winning_cells(self):
+        for macro in (self.macro_x, self.macro_o):
+            for line in WIN_MASKS:
+                if macro & line == line:
+                    return tuple(board * 9 + cell for board in range(BOARDS) if line >> board & 1
+                                 for cell in range(9))
+        return ()
+
+    def is_full(self):
+        return self.closed == FULL
+
+    def is_over(self):
+        return self.winner() is not None or self.closed == FULL
+
+    def choose_ai_move(self, difficulty, ai="O", player="X", rng=random, time_budget=TIME_BUDGET, stop=None):
+        moves = self.legal_moves()
+        if difficulty == "Easy":
+            return rng.choice(moves), "random", None
+        if difficulty in ("Medium", "Hard", "Adaptive"):
+            return tactical_move(self, moves, ai, player, rng, difficulty == "Hard")
+        searcher = UltimateSearch(min(time_budget, TIME_BUDGET))
+        searcher.stop = stop
+        return searcher.best_move(self, ai, player), "iterative_deepening", searcher
+
+
+def completes(own, other, cell):
+    return not (own | other) >> cell & 1 and WINS[own | 1 << cell]
+
+
+def tactical_move(board, moves, ai, player, rng, hard):
+    own_boards = board.boards_x if ai == "X" else board.boards_o
+    other_boards = board.boards_o if ai == "X" else board.boards_x
+    own_macro = board.macro_x if ai == "X" else board.macro_o
+
+    wins = []
+    blocks = []
+    for move in moves:
+        sub, cell = divmod(move, 9)
+        if completes(own_boards[sub], other_boards[sub], cell):
+            if WINS[own_macro | 1 << sub]:
+                return move, "win", None
+            wins.append(move)
+        elif completes(other_boards[sub], own_boards[sub], cell):
+            blocks.append(move)
+    if not hard:
+        if wins:
+            return rng.choice(wins), "win", None
+        if blocks:
+            return rng.choice(blocks), "block", None
+        return rng.choice(moves), "random", None
+
+    def sends_to_danger(move):
+        # The reply board (or a free choice) lets the opponent take a sub-board.
+        sub, target = divmod(move, 9)
+        own = own_boards[target] | (1 << target if sub == target else 0)
+        other = other_boards[target]
+        if board.closed >> target & 1 or WINS[own] or own | other == FULL:
+            return True
+        return any(completes(other, own, cell) for cell in range(9))
+
+    for candidates, branch in ((wins, "win"), (blocks, "block")):
+        safe = [move for move in candidates if not sends_to_danger(move)]
+        if safe or candidates:
+            return (safe or candidates)[0], branch, None
+    safe = [move for move in moves if not sends_to_danger(move)]
+    return min(safe or moves, key=PREFERRED_RANK.__getitem__), "preferred", None
+
+
+def local_score(own, other):
+    score = 0
+    for line in WIN_MASKS:
+        if not other & line:
+            score += LINE_WEIGHTS[bin(own & line).count("1")]
+        if not own & line:
+            score -= LINE_WEIGHTS[bin(other & line).count("1")]
+    return score
+
+
+_local_scores = {}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class UltimateSearch:
+    def __init__(self, time_budget=TIME_BUDGET):
+        self.time_budget = time_budget
+        self.deadline = 0.0
+        self.stop = None
+        self.nodes = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+
+    def evaluate(self, board, own_boards, other_boards, own_macro, other_macro):
+        closed = board.closed
+        drawn = closed & ~(own_macro | other_macro)
+        score = 0
+        for line in WIN_MASKS:
+            if drawn & line:
+                continue
+            if not other_macro & line:
+                score += BOARD_WEIGHT * LINE_WEIGHTS[bin(own_macro & line).count("1")]
+            if not own_macro & line:
+                score -= BOARD_WEIGHT * LINE_WEIGHTS[bin(other_macro & line).count("1")]
+        for sub in range(BOARDS):
+            if closed >> sub & 1:
+                continue
+            key = (own_boards[sub], other_boards[sub])
+            local = _local_scores.get(key)
+            if local is None:
+                local = _local_scores[key] = local_score(*key)
+            score += local * (3 if sub == 4 else 1)
+        return score
+
+    def negamax(self, board, mover, opponent, depth, ply, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and (time.perf_counter() > self.deadline
+                                      or self.stop is not None and self.stop.is_set()):
+            raise SearchTimeout
+        if ply > self.max_depth:
+            self.max_depth = ply
+
+        if board.winner() is not None:
+            return -(WIN_SCORE - ply)
+        moves = board.legal_moves()
+        if not moves:
+            return 0
+        if depth == 0:
+            if mover == "X":
+                return self.evaluate(board, board.boards_x, board.boards_o, board.macro_x, board.macro_o)
+            return self.evaluate(board, board.boards_o, board.boards_x, board.macro_o, board.macro_x)
+
+        best = -WIN_SCORE - 1
+        for move in moves:
+            board.place(move, mover)
+            score = -self.negamax(board, opponent, mover, depth - 1, ply + 1, -beta, -alpha)
+            board.undo()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def best_move(self, board, ai="O", player="X"):
+        self.deadline = time.perf_counter() + self.time_budget * (1 - SAFETY_MARGIN)
+        self.nodes = 0
+        self.max_depth = 0
+        board = board.copy()
+        moves = board.legal_moves()
+        best_move = tactical_move(board, moves, ai, player, random, True)[0]
+        try:
+            for depth in range(1, CELLS + 1):
+                ordered = [best_move] + [move for move in moves if move != best_move]
+                alpha = -WIN_SCORE - 1
+                depth_best = ordered[0]
+                for move in ordered:
+                    board.place(move, ai)
+                    score = -self.negamax(board, player, ai, depth - 1, 1, -WIN_SCORE - 1, -alpha)
+                    board.undo()
+                    if score > alpha:
+                        alpha = score
+                        depth_best = move
+                best_move = depth_best
+                if abs(alpha) >= WIN_SCORE - CELLS:
+                    break
+        except SearchTimeout:
+            pass
+        return best_move
+
+
+def perft(board, depth, symbol="X"):
+    if depth == 0:
+        return 1
+    if board.winner() is not None:
+        return 0
+    moves = board.legal_moves()
+    if depth == 1:
+        return len(moves)
+    other = "O" if symbol == "X" else "X"
+    total = 0
+    for move in moves:
+        board.place(move, symbol)
+        total += perft(board, depth - 1, other)
+        board.undo()
+    return total
+
+
+def play_game(first, second, rng, time_budget=TIME_BUDGET):
+    board = UltimateBoard()
+    policies = {"X": first, "O": second}
+    turn = "X"
+    while not board.is_over():
+        other = "O" if turn == "X" else "X"
+        move = board.choose_ai_move(policies[turn], turn, other, rng, time_budget)[0]
+        board.place(move, turn)
+        turn = other
+    return board.winner()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ultimate Tic-Tac-Toe perft and AI benchmarks.")
+    parser.add_argument("command", choices=["perft", "match"])
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--pair", nargs=2, default=["Expert", "Hard"], choices=engine.DIFFICULTIES)
+    parser.add_argument("--time-budget", type=float, default=TIME_BUDGET)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "perft":
+        for depth in range(1, args.depth + 1):
+            started = time.perf_counter()
+            nodes = perft(UltimateBoard(), depth)
+            elapsed = time.perf_counter() - started
+            print(f"depth {depth}: {nodes:>12,} positions {elapsed:8.3f} s "
+                  f"{nodes / elapsed if elapsed else 0:>12,.0f} positions/s")
+        return 0
+
+    rng = random.Random(args.seed)
+    first, second = args.pair
+    results = {first: 0, second: 0, None: 0}
+    started = time.perf_counter()
+    for game in range(args.games):
+        if game % 2 == 0:
+            winner = play_game(first, second, rng, args.time_budget)
+            results[{"X": first, "O": second}.get(winner)] += 1
+        else:
+            winner = play_game(second, first, rng, args.time_budget)
+            results[{"X": second, "O": first}.get(winner)] += 1
+    print(f"{first} {results[first]} | {second} {results[second]} | draws {results[None]} "
+          f"({args.games} games in {time.perf_counter() - started:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())